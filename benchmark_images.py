@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+import time
+import tracemalloc
+from pathlib import Path
+
+import typer
+from PIL import Image
+
+from parse_qwantz.fonts import get_column
+from parse_qwantz.panels import PANELS
+from parse_qwantz.prepare_image import prepare_image, get_masked_panel, ImageError
+from parse_qwantz.shape import get_shape
+from parse_qwantz.simple_image import SimpleImage, BitImage
+
+app = typer.Typer()
+
+
+def measure_build(
+    image_class: type[SimpleImage | BitImage], image: Image.Image
+) -> tuple[SimpleImage | BitImage, float, int]:
+    start = time.perf_counter()
+    image_class.from_image(image)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    simple_image = image_class.from_image(image)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return simple_image, elapsed, memory
+
+
+def measure_columns(simple_image: SimpleImage | BitImage) -> float:
+    start = time.perf_counter()
+    for y in range(0, simple_image.height - 13, 13):
+        for x in range(simple_image.width):
+            if isinstance(simple_image, BitImage):
+                simple_image.get_column(x, y, 13)
+            else:
+                get_column(x, y, simple_image, 13, set())
+    return time.perf_counter() - start
+
+
+def measure_shapes(simple_image: SimpleImage | BitImage) -> float:
+    start = time.perf_counter()
+    seen = set()
+    for pixel in simple_image.pixels:
+        if pixel not in seen:
+            seen.update(get_shape(pixel, simple_image))
+    return time.perf_counter() - start
+
+
+def benchmark_images(comic_dir: Path = Path('test/comics')) -> None:
+    """Compare the dict-based SimpleImage with the bit-plane BitImage on every panel."""
+    print(
+        "comic  panel   ink  build dict/bits (ms)   memory dict/bits (kB)"
+        "  columns dict/bits (ms)   shapes dict/bits (ms)"
+    )
+    totals = [0.0] * 8
+    for path in sorted(comic_dir.iterdir()):
+        image = Image.open(path)
+        try:
+            prepare_image(image)
+        except ImageError:
+            continue
+        for panel_no, panel in enumerate(PANELS, start=1):
+            cropped = get_masked_panel(image, panel)
+            dict_image, dict_time, dict_memory = measure_build(SimpleImage, cropped)
+            bit_image, bit_time, bit_memory = measure_build(BitImage, cropped)
+            results = (
+                dict_time * 1000, bit_time * 1000,
+                dict_memory / 1024, bit_memory / 1024,
+                measure_columns(dict_image) * 1000, measure_columns(bit_image) * 1000,
+                measure_shapes(dict_image) * 1000, measure_shapes(bit_image) * 1000,
+            )
+            totals = [total + result for total, result in zip(totals, results)]
+            print(
+                f"{path.stem:6} {panel_no:5} {len(dict_image.pixels):5}"
+                f"  {results[0]:8.2f} / {results[1]:8.2f}"
+                f"  {results[2]:9.1f} / {results[3]:9.1f}"
+                f"  {results[4]:9.2f} / {results[5]:9.2f}"
+                f"  {results[6]:9.2f} / {results[7]:9.2f}"
+            )
+    print(
+        f"{'total':18}  {totals[0]:8.2f} / {totals[1]:8.2f}  {totals[2]:9.1f} / {totals[3]:9.1f}"
+        f"  {totals[4]:9.2f} / {totals[5]:9.2f}  {totals[6]:9.2f} / {totals[7]:9.2f}"
+    )
+
+
+if __name__ == '__main__':
+    typer.run(benchmark_images)
@@ -1,2 +1,9 @@
+from importlib.metadata import version, PackageNotFoundError
+
+try:
+    __version__ = version('parse_qwantz')
+except PackageNotFoundError:
+    __version__ = 'unknown'
+
 from parse_qwantz.cli import app
 from parse_qwantz.main import main
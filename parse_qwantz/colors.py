@@ -16,6 +16,8 @@ GREY = Color(128, 128, 128)
 GREY2 = Color(117, 117, 117)
 GREY3 = Color(100, 100, 100)
 
+INK_COLORS = frozenset([BLACK, RED, GREY, GREY2, GREY3])
+
 
 def get_color_with_threshold(rgb: tuple[int, int, int]) -> Optional["Color"]:
     for color in [WHITE, BLACK, RED, GREY, GREY2, GREY3]:
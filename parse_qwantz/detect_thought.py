@@ -1,51 +1,81 @@
-from collections import deque
-from itertools import product
-
 from parse_qwantz.box import Box
 from parse_qwantz.pixels import Pixel
 from parse_qwantz.simple_image import SimpleImage
-from parse_qwantz.shape import get_shape, get_adjacent_pixels, get_box
+from parse_qwantz.shape import get_shape, Component
 
 
-def get_thought(pixel: Pixel, image: SimpleImage) -> tuple[Box, list[Pixel]] | None:
-    orig_pixels = get_shape(pixel, image)
-    box = get_box(orig_pixels)
+def get_thought(
+    pixel: Pixel, image: SimpleImage, component: Component | None = None
+) -> tuple[Box, list[Pixel]] | None:
+    if component is None:
+        component = Component.from_pixels(get_shape(pixel, image), image)
+    orig_pixels = component.pixels
+    box = component.box
     if any(x == 0 for x, y in orig_pixels) and any(x == image.width - 1 for x, y in orig_pixels):
         if len(set(y for x, y in orig_pixels)) > 2:
             box = Box(Pixel(0, 0), box.bottom_right)
             return box, sorted(orig_pixels)
         else:
             return None
-    tripled_pixels: set[Pixel] = set(orig_pixels)
-    for x, y in orig_pixels:
-        tripled_pixels.update({Pixel(x + 1, y), Pixel(x + 2, y)})
-    if is_thought(tripled_pixels, box, image) or is_thought(set(orig_pixels), box, image):
+    ink_rows = [0] * box.height
+    for y, x_start, x_end in component.runs:
+        ink_rows[y - box.top] |= (1 << x_end - x_start + 1) - 1 << x_start - box.left
+    # the shape dilated by two pixels to the right, which closes small gaps
+    full_row = (1 << box.width) - 1
+    tripled_rows = [(row | row << 1 | row << 2) & full_row for row in ink_rows]
+    if is_thought(tripled_rows, box, image) or is_thought(ink_rows, box, image):
         return box, sorted(orig_pixels)
 
 
-def is_thought(pixels: set[Pixel], box: Box, image: SimpleImage) -> bool:
-    x_range = range(box.left, box.right)
-    y_range = range(box.top, box.bottom)
-    outside = set()
-    outside.update(Pixel(box.left, y) for y in y_range)
-    outside.update(Pixel(box.right - 1, y) for y in y_range)
-    outside.update((Pixel(x, box.top) for x in x_range))
-    outside.update((Pixel(x, box.bottom - 1) for x in x_range))
-    for x, y in product(x_range, y_range):
-        if Pixel(x, y) in pixels:
-            continue
-        visited = set()
-        to_visit = deque([Pixel(x, y)])
-        while to_visit:
-            current = to_visit.popleft()
-            on_image_border = image.is_on_edge(current)
-            if current in visited or current in pixels or not box.includes(current) or on_image_border:
-                continue
-            if current in outside:
-                outside.update(visited)
-                break
-            visited.add(current)
-            to_visit.extend(get_adjacent_pixels(current))
-        else:
+def is_thought(ink_rows: list[int], box: Box, image: SimpleImage) -> bool:
+    """
+    Whether the ink encloses any pixels of the box, i.e. some of the other pixels can't be reached from the border of
+    the box. ink_rows are row bitmasks of the ink in the box (bit x - box.left for column x). The image edge is a
+    wall, and a pixel on the image edge without ink counts as enclosed.
+    """
+    width = box.width
+    full_row = (1 << width) - 1
+    edge_columns = 0
+    for x in (0, image.width - 1):
+        if box.left <= x < box.right:
+            edge_columns |= 1 << x - box.left
+    free_rows = []
+    for y, ink_row in zip(range(box.top, box.bottom), ink_rows):
+        edge_row = full_row if y in (0, image.height - 1) else edge_columns
+        if edge_row & ~ink_row:
             return True
-    return False
+        free_rows.append(full_row & ~ink_row & ~edge_row)
+    # flood fill the free pixels from the border of the box, a horizontal run at a time
+    reached_rows = [0] * len(free_rows)
+    to_visit = []
+    for i, free_row in enumerate(free_rows):
+        if i in (0, len(free_rows) - 1):
+            seeds = free_row
+        else:
+            seeds = free_row & (1 | 1 << width - 1)
+        reached_rows[i] |= fill_runs(free_row, seeds)
+        to_visit.append(i)
+    while to_visit:
+        i = to_visit.pop()
+        for j in (i - 1, i + 1):
+            if 0 <= j < len(free_rows):
+                new_reached = fill_runs(free_rows[j], reached_rows[i] & free_rows[j] & ~reached_rows[j])
+                if new_reached:
+                    reached_rows[j] |= new_reached
+                    to_visit.append(j)
+    return any(free_row & ~reached_row for free_row, reached_row in zip(free_rows, reached_rows))
+
+
+def fill_runs(row: int, seeds: int) -> int:
+    """The runs of set bits in row which contain any of the seeds."""
+    filled = 0
+    seeds &= row
+    while seeds:
+        seed = seeds & -seeds
+        # the run starts above the highest unset bit below the seed, and ends where the carry from adding the seed stops
+        start = (~row & seed - 1).bit_length()
+        end = ((row + seed) ^ row).bit_length() - 1
+        run = (1 << end) - (1 << start)
+        filled |= run
+        seeds &= ~run
+    return filled
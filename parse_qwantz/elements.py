@@ -1,15 +1,14 @@
-from functools import reduce
 from logging import getLogger
 
 from parse_qwantz.box import Box
-from parse_qwantz.fonts import ALL_FONTS
+from parse_qwantz.fonts import ALL_FONTS, LINE_START_INDEX, get_glyph_cache_info
 from parse_qwantz.lines import Line, get_line
 from parse_qwantz.match_lines import Character, Direction
 from parse_qwantz.text_lines import TextLine, try_text_line, cleanup_text_lines
 from parse_qwantz.detect_thought import get_thought
-from parse_qwantz.pixels import Pixel, remove_subsequence
-from parse_qwantz.shape import get_shape
-from parse_qwantz.simple_image import SimpleImage
+from parse_qwantz.pixels import Pixel
+from parse_qwantz.shape import get_shape, ComponentLabels, Component
+from parse_qwantz.simple_image import SimpleImage, RemainingInk
 
 logger = getLogger()
 
@@ -22,17 +21,21 @@ def get_elements(
     line_widths: list[int] = []
     thoughts: list[Box] = []
     unmatched: list[list[Pixel]] = []
-    sorted_pixels = sorted(image.pixels)
+    remaining = RemainingInk.from_simple_image(image)
+    components = ComponentLabels(image)
     extra_characters = []
-    while sorted_pixels:
-        pixel = sorted_pixels[0]
-        pixels = set(sorted_pixels)
-        tmp_image = SimpleImage(
-            width=image.width,
-            height=image.height,
-            pixels={pixel: color for pixel, color in image.pixels.items() if pixel in pixels},
+    line_starts_tried = line_starts_skipped = 0
+    while (pixel := remaining.next_seed()) is not None:
+        all_line_starts = LINE_START_INDEX.get_line_starts(pixel, remaining)
+        for font, line_starts in zip(ALL_FONTS, all_line_starts):
+            if line_starts is not None:
+                line_starts_tried += len(line_starts)
+                line_starts_skipped += (font.max_start_offset + 1) * font.height - len(line_starts)
+        text_line_candidates = (
+            try_text_line(pixel, remaining, font, line_starts)
+            for font, line_starts in zip(ALL_FONTS, all_line_starts)
+            if line_starts != []
         )
-        text_line_candidates = (try_text_line(pixel, tmp_image, font) for font in ALL_FONTS)
         text_line_candidates = [text_line for text_line in text_line_candidates if text_line]
         longest_candidate = max(text_line_candidates, key=lambda tl: tl[0].box().right, default=None)
         # UGLY SPECIAL CASE AHOY
@@ -46,34 +49,43 @@ def get_elements(
             for warning in warnings:
                 logger.warning(warning)
             text_lines.append(longest_line)
-            pixels = reduce(set.union, (char_box.pixels for char_box in longest_line.char_boxes))
-            sorted_pixels = remove_subsequence(sorted_pixels, sorted(pixels))
+            for char_box in longest_line.char_boxes:
+                if glyph := char_box.glyph:
+                    image_columns = list(glyph.get_image_columns())
+                    remaining.consume_columns(glyph.y0, glyph.height, image_columns)
+                    components.remove_columns(glyph.y0, glyph.height, image_columns)
         else:
-            result = get_line(pixel, tmp_image)
+            component = components.get_component(pixel)
+            result = get_line(pixel, remaining, component)
             if result:
-                line, line_pixels, width = result
+                line, _pixels, width = result
                 lines.append(line)
                 line_widths.append(width)
-                sorted_pixels = remove_subsequence(sorted_pixels, line_pixels)
-            elif result := get_batman(pixel, tmp_image):
-                batman_box, batman_pixels, batman_direction = result
+            elif result := get_batman(pixel, remaining, component):
+                batman_box, _pixels, batman_direction = result
                 extra_characters.append(Character("Floating Batman head", (batman_box,), batman_direction))
-                sorted_pixels = remove_subsequence(sorted_pixels, batman_pixels)
-            elif result := get_thought(pixel, tmp_image):
-                box, thought_pixels = result
+            elif result := get_thought(pixel, remaining, component):
+                box, _pixels = result
                 thoughts.append(box)
-                sorted_pixels = remove_subsequence(sorted_pixels, thought_pixels)
             else:
-                unmatched_pixels = sorted(get_shape(pixel, tmp_image))
+                unmatched_pixels = sorted(component.pixels)
                 unmatched.append(unmatched_pixels)
-                sorted_pixels = remove_subsequence(sorted_pixels, unmatched_pixels)
                 logger.warning(f"No match found for shape at {(pixel.x, pixel.y)} ({len(unmatched_pixels)} pixels)")
+            remaining.consume(component.pixels)
+            components.remove_component(component)
+    logger.debug(f"Indexed fonts: tried {line_starts_tried} line starts, skipped {line_starts_skipped}")
+    glyph_cache_hits, glyph_cache_misses = get_glyph_cache_info()
+    logger.debug(f"Glyph cache: {glyph_cache_hits} hits, {glyph_cache_misses} misses")
     return lines, line_widths, thoughts, cleanup_text_lines(text_lines), extra_characters, unmatched
 
 
-def get_batman(pixel: Pixel, image: SimpleImage) -> tuple[Box, list[Pixel], Direction] | None:
-    pixels = get_shape(pixel, image)
-    if len(pixels) != 187:
+def get_batman(
+    pixel: Pixel, image: SimpleImage, component: Component | None = None
+) -> tuple[Box, list[Pixel], Direction] | None:
+    if component is None:
+        component = Component.from_pixels(get_shape(pixel, image), image)
+    pixels = component.pixels
+    if component.size != 187:
         return None
     if Pixel(pixel.x + 11, pixel.y - 7) in pixels and Pixel(pixel.x + 11, pixel.y - 8) not in pixels:
         return Box(Pixel(pixel.x + 1, pixel.y - 7), Pixel(pixel.x + 15, pixel.y + 11)), sorted(pixels), Direction.LEFT
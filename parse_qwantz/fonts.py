@@ -1,19 +1,27 @@
+import hashlib
 import itertools
+import logging
+import os
+import sys
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
+from functools import cache, cached_property, lru_cache
 from importlib.resources import as_file, files
-from itertools import islice, chain
+from itertools import combinations
 from pathlib import Path
-from typing import NamedTuple, ContextManager, Iterator, ForwardRef, Union, Any, Sequence
+from typing import NamedTuple, ContextManager, Iterator, ForwardRef, Union, Any, Sequence, Callable, Iterable
 
 from PIL import Image
 
 import parse_qwantz
+from parse_qwantz import persistent_cache
 from parse_qwantz.box import Box
 from parse_qwantz.char_variants import VARIANTS
 from parse_qwantz.pixels import Pixel
 from parse_qwantz.simple_image import SimpleImage
 
+logger = logging.getLogger()
+
 CHARS = (
     "0123456789"
     "abcdefghijklmnopqrstuvwxyz"
@@ -27,6 +35,26 @@ FORBIDDEN_FIRST_CHARS = ")=^|}”·™_"
 
 ACCEPT = -1
 
+DEFAULT_GLYPH_CACHE_SIZE = 4096
+
+
+def get_glyph_cache_size() -> int:
+    value = os.environ.get('PARSE_QWANTZ_GLYPH_CACHE_SIZE')
+    if value is None:
+        return DEFAULT_GLYPH_CACHE_SIZE
+    try:
+        size = int(value)
+    except ValueError:
+        logger.warning(f"Invalid PARSE_QWANTZ_GLYPH_CACHE_SIZE {value!r}, using {DEFAULT_GLYPH_CACHE_SIZE}")
+        return DEFAULT_GLYPH_CACHE_SIZE
+    if size < 0:
+        logger.warning(f"Negative PARSE_QWANTZ_GLYPH_CACHE_SIZE {size}, using {DEFAULT_GLYPH_CACHE_SIZE}")
+        return DEFAULT_GLYPH_CACHE_SIZE
+    return size
+
+
+GLYPH_CACHE_SIZE = get_glyph_cache_size()
+
 FONT_SIZES = [
     (13, 'Regular', 8, 2, 1, None),
     (12, 'Condensed', 7, 0, 0, None),
@@ -45,19 +73,48 @@ class CharInfo:
     extra_info: str | None = None
 
 
+@dataclass(frozen=True)
+class Glyph:
+    x0: int
+    y0: int
+    height: int
+    # top pixel in the most significant bit
+    columns: tuple[int, ...]
+    italic_offsets: frozenset[int]
+
+    @cached_property
+    def pixels(self) -> set[Pixel]:
+        return get_pixels_from_columns(self.columns, self.height, self.x0, self.y0, self.italic_offsets)
+
+    def get_image_columns(self) -> Iterator[tuple[int, int]]:
+        # (x, column) pairs as read from the image, not sheared
+        if not self.italic_offsets:
+            return ((x, column) for x, column in enumerate(self.columns, start=self.x0) if column)
+        return (
+            (x, column & segment_mask)
+            for italic_offset, segment_mask in get_italic_segments(self.height, self.italic_offsets)
+            for x, column in enumerate(self.columns, start=self.x0 + italic_offset)
+            if column & segment_mask
+        )
+
+
 class CharBox(NamedTuple):
     char: str
     box: Box
     is_bold: bool
     is_italic: bool
-    pixels: set[Pixel]
+    glyph: Glyph | None
     extra_info: str | None = None
 
+    @property
+    def pixels(self) -> set[Pixel]:
+        return self.glyph.pixels if self.glyph else set()
+
     def with_box(self, box: Box):
-        return CharBox(self.char, box, self.is_bold, self.is_italic, self.pixels)
+        return CharBox(self.char, box, self.is_bold, self.is_italic, self.glyph)
 
     def with_char(self, char: str):
-        return CharBox(char, self.box, self.is_bold, self.is_italic, self.pixels)
+        return CharBox(char, self.box, self.is_bold, self.is_italic, self.glyph)
 
     @classmethod
     def space(cls, is_bold: bool, is_italic: bool, box: Box | None = None) -> "CharBox":
@@ -66,7 +123,7 @@ class CharBox(NamedTuple):
             box=box or Box.dummy(),
             is_bold=is_bold,
             is_italic=is_italic,
-            pixels=set(),
+            glyph=None,
         )
 
 
@@ -75,13 +132,69 @@ FSA_BACKREF = ForwardRef("FSA")
 FSA = dict[int, Union[FSA_BACKREF, CharInfo]]
 
 
+@dataclass
+class Automaton:
+    state_count: int
+    # column * state_count + state -> next state; 0 is the initial state
+    transitions: dict[int, int]
+    accepting: list[CharInfo | None]
+    # the only (column, next state) pair leaving a non-accepting state, if there's exactly one
+    single_transitions: list[tuple[int, int] | None]
+
+    @classmethod
+    def compile(cls, fsa: FSA) -> "Automaton":
+        states = [fsa]
+        state_ids = {id(fsa): 0}
+        edges = []
+        for state in states:
+            for column, next_state in state.items():
+                if column != ACCEPT:
+                    state_ids[id(next_state)] = len(states)
+                    states.append(next_state)
+                    edges.append((state_ids[id(state)], column, state_ids[id(next_state)]))
+        state_count = len(states)
+        single_transitions: list[tuple[int, int] | None] = [None] * state_count
+        for state_id, column, next_state_id in edges:
+            if len(states[state_id]) == 1:
+                single_transitions[state_id] = column, next_state_id
+        return cls(
+            state_count=state_count,
+            transitions={
+                column * state_count + state_id: next_state_id for state_id, column, next_state_id in edges
+            },
+            accepting=[state.get(ACCEPT) for state in states],
+            single_transitions=single_transitions,
+        )
+
+    def get_next_state(self, state: int, column: int) -> int | None:
+        return self.transitions.get(column * self.state_count + state)
+
+    def get_children(self) -> list[list[tuple[int, int]]]:
+        children: list[list[tuple[int, int]]] = [[] for _ in range(self.state_count)]
+        for key, next_state in self.transitions.items():
+            column, state = divmod(key, self.state_count)
+            children[state].append((column, next_state))
+        return children
+
+    def get_leaf_paths(self) -> Iterator[tuple[list[int], int]]:
+        # column sequences leading to states with no transitions out
+        children = self.get_children()
+        stack = [([], 0)]
+        while stack:
+            path, state = stack.pop()
+            if not children[state]:
+                yield path, state
+            for column, next_state in children[state]:
+                stack.append((path + [column], next_state))
+
+
 @dataclass
 class Font(ABC):
     name: str
     space_width: int
     height: int
     base: int
-    automaton: FSA
+    automaton: Automaton
     initial_padding: int
     final_padding: int
     is_bold: bool
@@ -96,6 +209,29 @@ class Font(ABC):
     base_right_padding: int = 0
     skip_chars: Sequence[str] = ()
 
+    @property
+    def max_start_offset(self) -> int:
+        # italic chars lean right, so a text line may start left of the seed pixel
+        return self.space_width - 3 if self.italic_offsets else 0
+
+    def get_line_starts(self, pixel: Pixel) -> list[Pixel]:
+        # in order of preference
+        x0, y0 = pixel
+        return [
+            Pixel(x, y)
+            for x in range(x0 - self.max_start_offset, x0 + 1)
+            for y in range(y0, y0 - self.height, -1)
+        ]
+
+    @cached_property
+    def cuts(self) -> list[tuple[int, int]]:
+        # (cut_bottom, cut_top) pairs, in order of preference
+        return (
+            [(0, 0)]
+            + [(cut_bottom, 0) for cut_bottom in range(1, self.max_cut_bottom + 1)]
+            + [(0, cut_top) for cut_top in range(1, self.max_cut_top + 1)]
+        )
+
     def get_char(
         self,
         pixel: Pixel,
@@ -103,78 +239,64 @@ class Font(ABC):
         is_first: bool = False,
         first_column: int | None = None,
     ) -> tuple[CharBox | None, int | None]:
-        char_box, complement = self._get_char_box_from_columns(
-            pixel, self._get_columns(pixel, image), is_first, first_column
-        )
-        if char_box:
-            return char_box, complement
-
-        for cut_bottom in range(1, self.max_cut_bottom + 1):
-            columns = self._get_columns(pixel, image, cut_bottom=cut_bottom)
-            char_box, complement = self._get_char_box_from_columns(pixel, columns, is_first, first_column)
-            if char_box:
-                return char_box, complement
-
-        for cut_top in range(1, self.max_cut_top + 1):
-            columns = self._get_columns(pixel, image, cut_top=cut_top)
-            char_box, complement = self._get_char_box_from_columns(pixel, columns, is_first, first_column)
-            if char_box:
-                return char_box, complement
-        return None, None
-
-    def _get_char_box_from_columns(
-        self, pixel: Pixel, columns: Iterator[tuple[int, int]], is_first: bool, first_column: int | None
-    ) -> tuple[CharBox | None, int | None]:
-        is_italic = bool(self.italic_offsets)
-        if first_column is not None:
-            pixel = Pixel(pixel.x - 1, pixel.y)
-            columns = chain([(pixel.x, first_column)], columns)
-        x = column = 0  # to satisfy linters; columns are never empty
-        for x, column in islice(columns, self.initial_padding + 1):
-            if column != 0:
-                break
-        else:
-            for x, column in columns:
-                if column != 0:
-                    char_box = CharBox.space(
-                        self.is_bold,
-                        is_italic,
-                        Box(pixel, Pixel(x, pixel.y + self.height)),
-                    )
-                    return char_box, None
-        x0 = x
-        state = self.automaton
-        accepted = None
-        char_columns = []
-        for x, column in chain([(x0, column)], columns):
-            if column not in state:
-                if not self.is_mono and len(state) == 1:
-                    actual_column, next_state = next(iter(state.items()))
-                    if actual_column != ACCEPT and ACCEPT in next_state and column | actual_column == column:
-                        complement = column & ~actual_column
-                        if complement in self.automaton:
-                            char_columns.append(actual_column)
-                            accepted = (x, next_state[ACCEPT], complement, char_columns)
-                if accepted:
-                    break
-                return None, None
-            state = state[column]
-            char_columns.append(column)
-            if ACCEPT in state:
-                accepted = (x, state[ACCEPT], None, list(char_columns))
+        x0, y0 = pixel
+        start = pixel if first_column is None else Pixel(x0 - 1, y0)
+        max_x = image.width + self.final_padding
+        if self.is_mono:
+            max_x = min(max_x, x0 + self.space_width * 2 + 1)
+        if self.is_mono and first_column is None and GLYPH_CACHE_SIZE:
+            window = tuple(get_columns(x0, max_x, y0, image, self.height, self.italic_offsets))
+            decoded = self.cached_decode_window(window, is_first)
         else:
-            if not accepted:
-                return None, None
-        x, char_info, complement, char_columns = accepted
-        if is_first and char_info.char in FORBIDDEN_FIRST_CHARS:
+            columns = ((x - x0, get_column(x, y0, image, self.height, self.italic_offsets)) for x in range(x0, max_x))
+            decoded = self.decode_columns(columns, is_first, first_column)
+        if decoded is None:
             return None, None
+        return self.get_char_box(start, x0, decoded)
+
+    def decode_columns(
+        self, columns: Iterable[tuple[int, int]], is_first: bool, first_column: int | None
+    ) -> "DecodedChar | None":
+        """Match a char in (x, column) pairs, x relative to the start, trying all the cuts in a single pass."""
+        matches = [CharMatch(self, is_first) for _ in self.cuts]
+        if first_column is not None:
+            for match in matches:
+                match.feed(-1, first_column)
+            if (decided_match := get_first_match(matches)) is not None:
+                return decided_match.result
+        for x, column in columns:
+            for match, (cut_bottom, cut_top) in zip(matches, self.cuts):
+                if not match.is_done:
+                    match.feed(x, cut_column(column, self.height, cut_bottom, cut_top))
+            if (decided_match := get_first_match(matches)) is not None:
+                return decided_match.result
+        for match in matches:
+            if not match.is_done:
+                match.finish()
+        return get_first_match(matches).result
+
+    def decode_window(self, window: tuple[int, ...], is_first: bool) -> "DecodedChar | None":
+        return self.decode_columns(enumerate(window), is_first, None)
+
+    @cached_property
+    def cached_decode_window(self) -> Callable[[tuple[int, ...], bool], "DecodedChar | None"]:
+        return lru_cache(maxsize=GLYPH_CACHE_SIZE)(self.decode_window)
+
+    def get_char_box(self, pixel: Pixel, origin: int, decoded: "DecodedChar") -> tuple[CharBox, int | None]:
+        # the decoded x positions are relative to origin
+        char_info, x0, x, complement, char_columns = decoded
+        x0 += origin
+        x += origin
+        is_italic = bool(self.italic_offsets)
+        if char_info is None:
+            return CharBox.space(self.is_bold, is_italic, Box(pixel, Pixel(x, pixel.y + self.height))), None
         if char_info.left_padding < 0 and x0 - char_info.left_padding - pixel.x >= self.initial_padding:
             return CharBox.space(
                 self.is_bold,
                 is_italic,
                 Box(pixel, Pixel(x0 - char_info.left_padding, pixel.y + self.height)),
             ), char_columns[0]
-        pixels = get_pixels_from_columns(char_columns, self.height, x0, pixel.y, self.italic_offsets)
+        glyph = Glyph(x0, pixel.y, self.height, char_columns, frozenset(self.italic_offsets))
         if char_info.right_padding < 0 and complement is None:
             complement = 0
         return CharBox(
@@ -185,25 +307,10 @@ class Font(ABC):
             ),
             self.is_bold,
             is_italic,
-            pixels,
+            glyph,
             char_info.extra_info,
         ), complement
 
-    def _get_columns(
-        self, pixel: Pixel,
-        image: SimpleImage,
-        cut_bottom: int = 0,
-        cut_top: int = 0,
-    ) -> Iterator[tuple[int, int]]:
-        max_x = image.width + self.final_padding
-        if self.is_mono:
-            max_x = min(max_x, pixel.x + self.space_width * 2 + 1)
-        for x in range(pixel.x, max_x):
-            yield x, self._get_column(x, pixel.y, image, cut_bottom, cut_top)
-
-    def _get_column(self, x: int, y: int, image: SimpleImage, cut_bottom: int, cut_top: int) -> int:
-        return get_column(x, y, image, self.height, self.italic_offsets, cut_bottom, cut_top)
-
     def __str__(self):
         return self.name
 
@@ -259,7 +366,7 @@ class Font(ABC):
             cls.get_space_width(image, width, is_bold, **kwargs),
             height,
             base,
-            automaton,
+            Automaton.compile(automaton),
             initial_padding,
             final_padding,
             is_bold,
@@ -321,6 +428,47 @@ class Font(ABC):
 
 
 class MonospaceFont(Font):
+    def get_char(
+        self,
+        pixel: Pixel,
+        image: SimpleImage,
+        is_first: bool = False,
+        first_column: int | None = None,
+    ) -> tuple[CharBox | None, int | None]:
+        if not is_first and first_column is None and (char_box := self._get_char_box_from_cell(pixel, image)):
+            return char_box, None
+        return super().get_char(pixel, image, is_first, first_column)
+
+    @cached_property
+    def cells(self) -> dict[tuple[int, ...], tuple[int, CharInfo]]:
+        # cell columns -> (left padding, char), only for chars where the automaton would stop at the end of the cell
+        cells = {}
+        for path, state in self.automaton.get_leaf_paths():
+            char_info = self.automaton.accepting[state]
+            left_padding = self.space_width - len(path)
+            if char_info is not None and 0 <= left_padding <= self.initial_padding:
+                cells[(0,) * left_padding + tuple(path)] = left_padding, char_info
+        return cells
+
+    def _get_char_box_from_cell(self, pixel: Pixel, image: SimpleImage) -> CharBox | None:
+        x0, y0 = pixel
+        x1 = x0 + self.space_width
+        if x1 > image.width + self.final_padding:
+            return None
+        cell = tuple(get_columns(x0, x1, y0, image, self.height, self.italic_offsets))
+        if (match := self.cells.get(cell)) is None:
+            return None
+        left_padding, char_info = match
+        x = x0 + left_padding
+        return CharBox(
+            char_info.char,
+            Box(Pixel(x - char_info.left_padding, y0), Pixel(x1, y0 + self.height)),
+            self.is_bold,
+            bool(self.italic_offsets),
+            Glyph(x, y0, self.height, cell[left_padding:], frozenset(self.italic_offsets)),
+            char_info.extra_info,
+        )
+
     @classmethod
     def get_input_columns(
         cls,
@@ -386,18 +534,116 @@ class ProportionalFont(Font):
         return space_width
 
 
+class DecodedChar(NamedTuple):
+    # a space ending at x if None
+    char_info: CharInfo | None
+    x0: int
+    x: int
+    complement: int | None
+    char_columns: tuple[int, ...]
+
+
+class CharMatch:
+    """The walk of the font automaton for one cut in Font.decode_columns, fed one column at a time."""
+    def __init__(self, font: Font, is_first: bool):
+        self.font = font
+        self.is_first = is_first
+        self.skipped = 0
+        self.x0: int | None = None
+        self.state = 0
+        self.char_columns: list[int] = []
+        self.accepted: tuple[int, CharInfo, int | None, list[int]] | None = None
+        self.is_done = False
+        self.result: DecodedChar | None = None
+
+    def feed(self, x: int, column: int) -> None:
+        font = self.font
+        if self.x0 is None:
+            if column == 0:
+                self.skipped += 1
+                return
+            if self.skipped > font.initial_padding:
+                self.is_done = True
+                self.result = DecodedChar(None, x, x, None, ())
+                return
+            self.x0 = x
+        automaton = font.automaton
+        accepting = automaton.accepting
+        next_state = automaton.transitions.get(column * automaton.state_count + self.state)
+        if next_state is None:
+            if not font.is_mono and (single_transition := automaton.single_transitions[self.state]) is not None:
+                actual_column, next_state = single_transition
+                if accepting[next_state] is not None and column | actual_column == column:
+                    complement = column & ~actual_column
+                    if automaton.get_next_state(0, complement) is not None:
+                        self.char_columns.append(actual_column)
+                        self.accepted = (x, accepting[next_state], complement, self.char_columns)
+            self.finish()
+            return
+        self.state = next_state
+        self.char_columns.append(column)
+        if accepting[next_state] is not None:
+            self.accepted = (x, accepting[next_state], None, list(self.char_columns))
+
+    def finish(self) -> None:
+        self.is_done = True
+        if self.accepted is None:
+            return
+        x, char_info, complement, char_columns = self.accepted
+        if self.is_first and char_info.char in FORBIDDEN_FIRST_CHARS:
+            return
+        self.result = DecodedChar(char_info, self.x0, x, complement, tuple(char_columns))
+
+
+def get_first_match(matches: list[CharMatch]) -> CharMatch | None:
+    # None until every match before the first successful one is done; the last match if all of them failed
+    for match in matches:
+        if not match.is_done:
+            return None
+        if match.result is not None:
+            return match
+    return matches[-1]
+
+
+def get_glyph_cache_info() -> tuple[int, int]:
+    cache_infos = [font.cached_decode_window.cache_info() for font in ALL_FONTS]
+    return sum(info.hits for info in cache_infos), sum(info.misses for info in cache_infos)
+
+
 def get_column(
     x0: int, y0: int, image: SimpleImage, height: int, italic_offsets: set[int], cut_bottom: int = 0, cut_top: int = 0
 ) -> int:
-    bitmask = 0
+    if italic_offsets:
+        bitmask = 0
+        for italic_offset, segment_mask in get_italic_segments(height, frozenset(italic_offsets)):
+            bitmask |= image.get_column(x0 + italic_offset, y0, height) & segment_mask
+    else:
+        bitmask = image.get_column(x0, y0, height)
+    return cut_column(bitmask, height, cut_bottom, cut_top)
+
+
+def get_columns(
+    x0: int, x1: int, y0: int, image: SimpleImage, height: int, italic_offsets: set[int]
+) -> list[int]:
+    if italic_offsets:
+        columns = [0] * (x1 - x0)
+        for italic_offset, segment_mask in get_italic_segments(height, frozenset(italic_offsets)):
+            segment = image.get_columns(x0 + italic_offset, x1 + italic_offset, y0, height)
+            columns = [column | segment_column & segment_mask for column, segment_column in zip(columns, segment)]
+        return columns
+    return image.get_columns(x0, x1, y0, height)
+
+
+@cache
+def get_italic_segments(height: int, italic_offsets: frozenset[int]) -> list[tuple[int, int]]:
+    # (x offset, bitmask of the rows) pairs: the top rows are shifted right the most, one less at every italic offset
+    segments: dict[int, int] = {}
     italic_offset = len(italic_offsets)
-    for y in range(y0, y0 + height):
-        if y - y0 in italic_offsets:
+    for y in range(height):
+        if y in italic_offsets:
             italic_offset -= 1
-        bitmask <<= 1
-        if (x0 + italic_offset, y) in image.pixels:
-            bitmask += 1
-    return cut_column(bitmask, height, cut_bottom, cut_top)
+        segments[italic_offset] = segments.get(italic_offset, 0) | 1 << (height - 1 - y)
+    return list(segments.items())
 
 
 def cut_column(column: int, height: int, cut_bottom: int = 0, cut_top: int = 0):
@@ -409,7 +655,16 @@ def cut_column(column: int, height: int, cut_bottom: int = 0, cut_top: int = 0):
     return bitmask
 
 
-def get_pixels_from_columns(columns: list[int], height: int, x0: int, y0: int, italic_offsets: set[int]) -> set[Pixel]:
+def get_uncut_columns(column: int, height: int, cut_bottom: int, cut_top: int) -> list[int]:
+    # all the columns which cut_column maps to `column`
+    cut_mask = ((1 << cut_bottom) - 1) | (((1 << cut_top) - 1) << (height - cut_top))
+    if column & cut_mask:
+        return []
+    cut_bits = [1 << bit for bit in range(height) if cut_mask >> bit & 1]
+    return [column | sum(subset) for n in range(len(cut_bits) + 1) for subset in combinations(cut_bits, n)]
+
+
+def get_pixels_from_columns(columns: Sequence[int], height: int, x0: int, y0: int, italic_offsets: set[int]) -> set[Pixel]:
     pixels = set()
     for x, column in enumerate(columns, start=x0):
         italic_offset = 0
@@ -424,46 +679,188 @@ def get_pixels_from_columns(columns: list[int], height: int, x0: int, y0: int, i
     return pixels
 
 
-ALL_FONTS: list[Font] = [
-    MonospaceFont.from_file(
-        file_path_context_manager=as_file(files(parse_qwantz).joinpath(f'img/regular{size}.png')),
-        name=name,
-        width=width,
-        italic_offsets=set(),
-        is_bold=is_bold,
-        group=f'LC{size}',
-        max_cut_bottom=max_cut_bottom,
-        max_cut_top=max_cut_top,
-        display_name=display_name,
-    )
-    for size, name, width, max_cut_bottom, max_cut_top, display_name in FONT_SIZES
-    for is_bold in (False, True)
-]
+FONTS_CACHE_FILE = 'fonts.json'
+# the modules taking part in compiling the fonts from the glyph sheets
+FONT_MODULES = ['fonts.py', 'char_variants.py', 'simple_image.py', 'pixels.py', 'colors.py', 'box.py']
 
-ALL_FONTS.append(
-    MonospaceFont.from_file(
-        file_path_context_manager=as_file(files(parse_qwantz).joinpath(f'img/italic13.png')),
-        name='Italic',
-        width=8,
-        italic_offsets={3, 5, 9, 11},
-        is_bold=False,
-        group='LC13',
-        max_cut_bottom=0,
-        max_cut_top=0,
-    )
-)
 
-ALL_FONTS.append(
-    ProportionalFont.from_file(
-        file_path_context_manager=as_file(files(parse_qwantz).joinpath(f'img/serif13.png')),
-        name='Serif',
-        width=0,
-        italic_offsets=set(),
-        is_bold=False,
-        group='TNR13',
-        max_cut_bottom=0,
-        max_cut_top=0,
-        space_width=3,
-        display_name='serif'
+def build_fonts() -> list[Font]:
+    fonts: list[Font] = [
+        MonospaceFont.from_file(
+            file_path_context_manager=as_file(files(parse_qwantz).joinpath(f'img/regular{size}.png')),
+            name=name,
+            width=width,
+            italic_offsets=set(),
+            is_bold=is_bold,
+            group=f'LC{size}',
+            max_cut_bottom=max_cut_bottom,
+            max_cut_top=max_cut_top,
+            display_name=display_name,
+        )
+        for size, name, width, max_cut_bottom, max_cut_top, display_name in FONT_SIZES
+        for is_bold in (False, True)
+    ]
+    fonts.append(
+        MonospaceFont.from_file(
+            file_path_context_manager=as_file(files(parse_qwantz).joinpath(f'img/italic13.png')),
+            name='Italic',
+            width=8,
+            italic_offsets={3, 5, 9, 11},
+            is_bold=False,
+            group='LC13',
+            max_cut_bottom=0,
+            max_cut_top=0,
+        )
     )
-)
+    fonts.append(
+        ProportionalFont.from_file(
+            file_path_context_manager=as_file(files(parse_qwantz).joinpath(f'img/serif13.png')),
+            name='Serif',
+            width=0,
+            italic_offsets=set(),
+            is_bold=False,
+            group='TNR13',
+            max_cut_bottom=0,
+            max_cut_top=0,
+            space_width=3,
+            display_name='serif'
+        )
+    )
+    return fonts
+
+
+def get_fonts_key() -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    sheet_names = [f'regular{size}.png' for size, *_ in FONT_SIZES] + ['italic13.png', 'serif13.png']
+    for sheet_name in sheet_names:
+        digest.update(sheet_name.encode())
+        digest.update(files(parse_qwantz).joinpath('img', sheet_name).read_bytes())
+    digest.update(repr((CHARS, FONT_SIZES, sorted(VARIANTS.items()))).encode())
+    for module_name in FONT_MODULES:
+        digest.update(module_name.encode())
+        digest.update(files(parse_qwantz).joinpath(module_name).read_bytes())
+    digest.update(repr((parse_qwantz.__version__, tuple(sys.version_info))).encode())
+    return digest.hexdigest()
+
+
+def font_to_json(font: Font) -> dict[str, Any]:
+    data: dict[str, Any] = {field.name: getattr(font, field.name) for field in fields(font)}
+    automaton = font.automaton
+    data['automaton'] = {
+        'state_count': automaton.state_count,
+        'transitions': list(automaton.transitions.items()),
+        'accepting': [
+            None if char_info is None else [
+                char_info.char, char_info.left_padding, char_info.right_padding, char_info.extra_info
+            ]
+            for char_info in automaton.accepting
+        ],
+        'single_transitions': automaton.single_transitions,
+    }
+    data['italic_offsets'] = sorted(font.italic_offsets)
+    data['skip_chars'] = list(font.skip_chars)
+    return {'type': type(font).__name__, 'fields': data}
+
+
+def font_from_json(data: dict[str, Any]) -> Font:
+    font_class = {cls.__name__: cls for cls in (MonospaceFont, ProportionalFont)}[data['type']]
+    font_fields = dict(data['fields'])
+    automaton = font_fields['automaton']
+    font_fields['automaton'] = Automaton(
+        state_count=automaton['state_count'],
+        transitions={key: next_state for key, next_state in automaton['transitions']},
+        accepting=[None if char_info is None else CharInfo(*char_info) for char_info in automaton['accepting']],
+        single_transitions=[
+            None if transition is None else tuple(transition) for transition in automaton['single_transitions']
+        ],
+    )
+    font_fields['italic_offsets'] = set(font_fields['italic_offsets'])
+    font_fields['skip_chars'] = tuple(font_fields['skip_chars'])
+    return font_class(**font_fields)
+
+
+def load_fonts() -> list[Font]:
+    key = get_fonts_key()
+    cached = persistent_cache.read_json(FONTS_CACHE_FILE)
+    if isinstance(cached, dict) and cached.get('key') == key:
+        try:
+            return [font_from_json(font_data) for font_data in cached['fonts']]
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            logger.info(f"Could not load cached fonts: {e}")
+    fonts = build_fonts()
+    persistent_cache.write_json(FONTS_CACHE_FILE, {'key': key, 'fonts': [font_to_json(font) for font in fonts]})
+    return fonts
+
+
+ALL_FONTS: list[Font] = load_fonts()
+
+
+class LineStartIndex:
+    """The fonts which can begin a char with the given first (two) columns, to skip line starts that can't."""
+    def __init__(self, fonts: list[Font]):
+        self.fonts = fonts
+        # (height, italic offsets) -> column (or pair of columns) -> bitmask of font indices
+        self.first_columns: dict[tuple[int, frozenset[int]], dict[int, int]] = {}
+        self.first_two_columns: dict[tuple[int, frozenset[int]], dict[int, int]] = {}
+        self.font_indices: dict[tuple[int, frozenset[int]], list[int]] = {}
+        for i, font in enumerate(fonts):
+            # fonts with a single initial transition aren't indexed
+            if font.automaton.single_transitions[0] is not None:
+                continue
+            key = font.height, frozenset(font.italic_offsets)
+            self.font_indices.setdefault(key, []).append(i)
+            first_columns = self.first_columns.setdefault(key, {})
+            first_two_columns = self.first_two_columns.setdefault(key, {})
+            automaton = font.automaton
+            children = automaton.get_children()
+            for cut in font.cuts:
+                for column in get_uncut_columns(0, font.height, *cut):
+                    if column:
+                        first_columns[column] = first_columns.get(column, 0) | 1 << i
+                for first_column, state in children[0]:
+                    # a char may end after this column (or, for proportional fonts, within the next one)
+                    if not font.is_mono or automaton.accepting[state] is not None:
+                        for column in get_uncut_columns(first_column, font.height, *cut):
+                            first_columns[column] = first_columns.get(column, 0) | 1 << i
+                        continue
+                    for second_column, _next_state in children[state]:
+                        for column1 in get_uncut_columns(first_column, font.height, *cut):
+                            for column2 in get_uncut_columns(second_column, font.height, *cut):
+                                pair = column1 << font.height | column2
+                                first_two_columns[pair] = first_two_columns.get(pair, 0) | 1 << i
+
+    def get_line_starts(self, pixel: Pixel, image: SimpleImage) -> list[list[Pixel] | None]:
+        """For each font, the starts from font.get_line_starts(pixel) where a char may begin (None if not indexed)."""
+        x0, y0 = pixel
+        line_starts: list[list[Pixel] | None] = [None] * len(self.fonts)
+        for (height, italic_offsets), font_indices in self.font_indices.items():
+            first_columns = self.first_columns[height, italic_offsets]
+            first_two_columns = self.first_two_columns[height, italic_offsets]
+            fonts = [(i, self.fonts[i]) for i in font_indices]
+            min_x = x0 - max(font.max_start_offset for _, font in fonts)
+            max_x = x0 + max(font.initial_padding for _, font in fonts) + 2
+            viable = {i: set() for i in font_indices}
+            for y in range(y0, y0 - height, -1):
+                columns = get_columns(min_x, max_x, y, image, height, italic_offsets)
+                # fonts_masks[j] is for the first non-empty column at or after min_x + j, paired with its position
+                fonts_masks = []
+                next_non_empty = None
+                for j in range(len(columns) - 2, -1, -1):
+                    if column := columns[j]:
+                        fonts_mask = first_columns.get(column, 0)
+                        fonts_mask |= first_two_columns.get(column << height | columns[j + 1], 0)
+                        next_non_empty = j, fonts_mask
+                    fonts_masks.append(next_non_empty)
+                fonts_masks.reverse()
+                # otherwise get_char would find no char or a space, and get_text_line rejects both
+                for i, font in fonts:
+                    for x in range(x0 - font.max_start_offset, x0 + 1):
+                        match = fonts_masks[x - min_x]
+                        if match and match[0] <= x - min_x + font.initial_padding and match[1] >> i & 1:
+                            viable[i].add(Pixel(x, y))
+            for i, font in fonts:
+                line_starts[i] = [start for start in font.get_line_starts(pixel) if start in viable[i]]
+        return line_starts
+
+
+LINE_START_INDEX = LineStartIndex(ALL_FONTS)
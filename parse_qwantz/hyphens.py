@@ -1,28 +1,120 @@
+import hashlib
 import logging
+import struct
 from collections.abc import Iterable
+from functools import cache
 
 from importlib.resources import as_file, files
 from itertools import chain
 
 import parse_qwantz
+from parse_qwantz import persistent_cache
 
 logger = logging.getLogger()
 
+WORDS_CACHE_FILE = 'words.bin'
+DICT_PATHS = [
+    'dict/unambiguous-qwantz.txt',
+    'dict/html-words.txt',
+    'dict/manual-additions.txt',
+]
+REMOVED_DICT_PATH = 'dict/manual-removed.txt'
 
-def make_word_set(dict_path: str, extra_words: Iterable[str] = ()) -> frozenset[str]:
+# all the numbers are stored little-endian, regardless of the platform
+WORDS_MAGIC = b'QWWL'
+WORDS_FORMAT_VERSION = 1
+# the magic, the format version, the digest of the dictionaries (16 bytes) and the word count
+HEADER = struct.Struct('<4sI16sQ')
+OFFSET = struct.Struct('<I')
+
+
+class WordList:
+    """
+    Sorted words encoded as one blob (a header, an offset table and the UTF-8 encoded words), so that it can be
+    memory mapped from the persistent cache and shared by all the workers. Membership is checked by bisection.
+    """
+    def __init__(self, data: bytes):
+        if len(data) < HEADER.size:
+            raise ValueError("Word list too short")
+        magic, version, self.key, self.count = HEADER.unpack_from(data)
+        if magic != WORDS_MAGIC or version != WORDS_FORMAT_VERSION:
+            raise ValueError("Unknown word list format")
+        self.data = data
+        self.words_start = HEADER.size + (self.count + 1) * OFFSET.size
+        if len(data) < self.words_start or self.get_offset(0) != 0:
+            raise ValueError("Invalid word list offsets")
+        if len(data) != self.words_start + self.get_offset(self.count):
+            raise ValueError("Invalid word list length")
+
+    @classmethod
+    def build(cls, words: Iterable[str], key: bytes) -> "WordList":
+        encoded_words = sorted(word.encode() for word in words)
+        offsets = [0]
+        for word in encoded_words:
+            offsets.append(offsets[-1] + len(word))
+        return cls(
+            HEADER.pack(WORDS_MAGIC, WORDS_FORMAT_VERSION, key, len(encoded_words))
+            + b''.join(OFFSET.pack(offset) for offset in offsets)
+            + b''.join(encoded_words)
+        )
+
+    def get_offset(self, i: int) -> int:
+        return OFFSET.unpack_from(self.data, HEADER.size + i * OFFSET.size)[0]
+
+    def get_word(self, i: int) -> bytes:
+        return self.data[self.words_start + self.get_offset(i):self.words_start + self.get_offset(i + 1)]
+
+    def __contains__(self, word: str) -> bool:
+        encoded_word = word.encode()
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_word(middle) < encoded_word:
+                low = middle + 1
+            else:
+                high = middle
+        return low < self.count and self.get_word(low) == encoded_word
+
+    def __len__(self) -> int:
+        return self.count
+
+
+def read_dict(dict_path: str) -> set[str]:
     with as_file(files(parse_qwantz).joinpath(dict_path)) as dict_path:
-        dict_words = (line.rstrip('\n').lower() for line in open(dict_path))
-    return frozenset(chain(dict_words, extra_words))
+        return {line.rstrip('\n').lower() for line in open(dict_path)}
+
+
+def get_dicts_key() -> bytes:
+    digest = hashlib.blake2b(digest_size=16)
+    for dict_path in DICT_PATHS + [REMOVED_DICT_PATH]:
+        digest.update(dict_path.encode())
+        digest.update(files(parse_qwantz).joinpath(dict_path).read_bytes())
+    return digest.digest()
+
+
+def build_word_list(key: bytes) -> WordList:
+    words = set(chain.from_iterable(read_dict(dict_path) for dict_path in DICT_PATHS))
+    return WordList.build(words - read_dict(REMOVED_DICT_PATH), key)
 
 
-QWANTZ_WORD_SET = (
-    make_word_set('dict/unambiguous-qwantz.txt')
-    | make_word_set('dict/html-words.txt')
-    | make_word_set('dict/manual-additions.txt')
-) - make_word_set('dict/manual-removed.txt')
+@cache
+def get_qwantz_words() -> WordList:
+    """Load the word list from the persistent cache, rebuilding it if any of the dictionaries has changed."""
+    key = get_dicts_key()
+    if (cached := persistent_cache.map_bytes(WORDS_CACHE_FILE)) is not None:
+        try:
+            word_list = WordList(cached)
+        except (ValueError, struct.error) as e:
+            logger.info(f"Rebuilding the word list cache: {e}")
+        else:
+            if word_list.key == key:
+                return word_list
+    word_list = build_word_list(key)
+    persistent_cache.write_bytes(WORDS_CACHE_FILE, word_list.data)
+    return word_list
 
 
-def disambiguate_hyphen(part1: list[str], part2: list[str], log=False):
+def disambiguate_hyphen(part1: list[str], part2: list[str], warnings: list[str] | None = None):
     word1 = part1[-1]
     word2 = part2[0]
     if not (word1 and word2):
@@ -31,24 +123,25 @@ def disambiguate_hyphen(part1: list[str], part2: list[str], log=False):
         return True
     if word2[0].isdigit():
         return True
+    qwantz_words = get_qwantz_words()
     word1_lower = word1.lower()
     word2_lower = word2.lower()
 
-    no_hyphen = word1_lower + word2_lower in QWANTZ_WORD_SET
-    with_hyphen = f"{word1_lower}-{word2_lower}" in QWANTZ_WORD_SET
-    all_with_hyphen = f"{'-'.join(part1)}-{'-'.join(part2)}" in QWANTZ_WORD_SET
+    no_hyphen = word1_lower + word2_lower in qwantz_words
+    with_hyphen = f"{word1_lower}-{word2_lower}" in qwantz_words
+    all_with_hyphen = f"{'-'.join(part1)}-{'-'.join(part2)}" in qwantz_words
 
     parts_for_logging = f"{'-'.join(part1)}/{'-'.join(part2)}"
     if no_hyphen:
-        if log and (with_hyphen or all_with_hyphen):
-            logger.warning(f"Ambiguous hyphen ({parts_for_logging}); both in Qwantz dict")
+        if warnings is not None and (with_hyphen or all_with_hyphen):
+            warnings.append(f"Ambiguous hyphen ({parts_for_logging}); both in Qwantz dict")
         return False
     if with_hyphen or all_with_hyphen:
         return True
     if len(part1) > 1 or len(part2) > 1:
-        if log and (word1_lower not in QWANTZ_WORD_SET or word2_lower not in QWANTZ_WORD_SET):
-            logger.warning(f"Unexpected hyphenation in multi-hyphened phrase ({parts_for_logging})")
+        if warnings is not None and (word1_lower not in qwantz_words or word2_lower not in qwantz_words):
+            warnings.append(f"Unexpected hyphenation in multi-hyphened phrase ({parts_for_logging})")
         return True
-    if log:
-        logger.warning(f"Unresolved hyphen ({parts_for_logging})")
+    if warnings is not None:
+        warnings.append(f"Unresolved hyphen ({parts_for_logging})")
     return False
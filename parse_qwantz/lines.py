@@ -2,16 +2,20 @@ from itertools import groupby, product
 
 from parse_qwantz.pixels import Pixel
 from parse_qwantz.simple_image import SimpleImage
-from parse_qwantz.shape import get_shape, get_box
+from parse_qwantz.shape import get_shape, Component
 
 Line = tuple[Pixel, Pixel]
 
 
-def get_line(pixel: Pixel, image: SimpleImage) -> tuple[Line, list[Pixel], int] | None:
-    pixels = get_shape(pixel, image)
-    if len(set(pixels.values())) != 1:
+def get_line(
+    pixel: Pixel, image: SimpleImage, component: Component | None = None
+) -> tuple[Line, list[Pixel], int] | None:
+    if component is None:
+        component = Component.from_pixels(get_shape(pixel, image), image)
+    pixels = component.pixels
+    if not component.is_uniform:
         return None
-    (x_min, y_min), (right, bottom), _ = get_box(pixels)
+    (x_min, y_min), (right, bottom), _ = component.box
     x_max = right - 1
     y_max = bottom - 1
     # \ or /
@@ -1,4 +1,3 @@
-import hashlib
 import logging
 import re
 import sys
@@ -7,7 +6,7 @@ from typing import Iterable
 
 from PIL import Image, ImageDraw
 
-from parse_qwantz.panel_overrides import get_panel_overrides
+from parse_qwantz.panel_overrides import get_panel_overrides, get_image_md5, is_fully_overridden
 from parse_qwantz.panels import PANELS, CHARACTERS
 from parse_qwantz.parser import parse_qwantz, match_stuff, parse_footer
 from parse_qwantz.elements import get_elements
@@ -17,9 +16,8 @@ from parse_qwantz.svg_gen import generate_svg
 
 
 def get_unambiguous_words(image: Image.Image) -> Iterable[str]:
-    md5 = hashlib.md5(image.tobytes()).hexdigest()
-    panel_overrides = get_panel_overrides().get(md5, {})
-    masked, good_panels = prepare_image(image)
+    panel_overrides = get_panel_overrides().get(get_image_md5(image), {})
+    masked = None if is_fully_overridden(panel_overrides) else prepare_image(image)[0]
     for i, (panel, characters) in enumerate(zip(PANELS, CHARACTERS), start=1):
         if str(i) in panel_overrides:
             panel = panel_overrides[str(i)]
@@ -27,8 +25,7 @@ def get_unambiguous_words(image: Image.Image) -> Iterable[str]:
                 yield from get_words(panel_line)
             continue
         (width, height), (x, y) = panel
-        cropped = masked.crop((x, y, x + width, y + height))
-        panel_image = SimpleImage.from_image(cropped)
+        panel_image = SimpleImage.from_bit_image(masked.crop(x, y, width, height))
         lines, _widths, thoughts, text_lines, extra_characters, unmatched_shapes = get_elements(panel_image)
         text_blocks, block_matches, thought_blocks, unmatched_stuff = match_stuff(
             characters + extra_characters, panel_image, lines, text_lines, thoughts
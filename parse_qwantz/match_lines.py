@@ -4,6 +4,8 @@ import math
 from dataclasses import dataclass
 from enum import Enum
 from functools import cmp_to_key
+from heapq import heappop, heappush
+from typing import TYPE_CHECKING
 
 from parse_qwantz.box import Box
 from parse_qwantz.lines import Line
@@ -12,6 +14,9 @@ from parse_qwantz.pixels import Pixel
 from parse_qwantz.simple_image import SimpleImage
 from parse_qwantz.text_lines import TextLine
 
+if TYPE_CHECKING:
+    from parse_qwantz.panel_scene import PanelScene
+
 logger = logging.getLogger()
 
 
@@ -59,53 +64,76 @@ class AnnotatedTarget:
     def __repr__(self):
         return f"AnnotatedTarget({repr(self.target)}, dist={self.distance:.2f}, cos={self.miss_angle_cos:.2f})"
 
-    @classmethod
-    def from_text_line(cls, text_line: TextLine, line: Line, end_no: int):
-        box = text_line.base_box(TEXT_LINE_INNER_PADDING)
-        return cls(
-            target=text_line,
-            distance=get_box_distance(box, line, end_no),
-            miss_angle_cos=get_miss_angle_cos(box, line, end_no),
-            line=line,
-            end_no=end_no,
-        )
 
-    @classmethod
-    def from_character(cls, character: Character, line: Line, end_no: int):
-        distances = (get_box_distance(box, line, end_no) for box in character.boxes)
-        distance = min((distance for distance in distances if distance is not None), default=None)
-        miss_angle_cos = max(get_miss_angle_cos(box, line, end_no) for box in character.boxes)
-        return cls(target=character, distance=distance, miss_angle_cos=miss_angle_cos, line=line, end_no=end_no)
-
-
-def match_lines(
-    lines: list[Line], text_blocks: list[TextBlock], characters: list[Character], image: SimpleImage
-) -> tuple[list[tuple[Target, Target]], list[Line]]:
-    text_lines = [text_line for text_block in text_blocks for text_line in text_block.lines]
-    line_candidates = [(line,) + match_line(line, text_lines, characters, image) for line in lines]
+def match_lines(scene: "PanelScene") -> tuple[list[tuple[Target, Target]], list[Line]]:
+    target_index = TargetIndex(list(scene.block_by_line), scene.characters)
+    line_candidates = [(line,) + match_line(line, target_index, scene.image) for line in scene.lines]
     # for _line, left, right in line_candidates:
     #     logger.info('candidates:')
     #     logger.info('left: ' + ' | '.join(str(l) for l in left))
     #     logger.info('right: ' + ' | '.join(str(r) for r in right))
-    block_mapping = {text_line: block for block in text_blocks for text_line in block.lines}
-    return CandidateResolver(line_candidates, block_mapping).resolve()
+    return CandidateResolver(line_candidates, scene.block_by_line).resolve()
+
+
+class TargetIndex:
+    """
+    Text lines and characters bucketed in a grid by their boxes, expanded by the distance thresholds. A line end can
+    only be matched to the targets in its grid cell: the distance from a box is never less than the distance along
+    either axis.
+    """
+    CELL_SIZE = TEXT_LINE_DISTANCE_THRESHOLD
+
+    def __init__(self, text_lines: list[TextLine], characters: list[Character]):
+        self.text_lines = text_lines
+        self.characters = characters
+        self.cells: dict[tuple[int, int], list[int]] = {}
+        text_line_boxes = [
+            (i, text_line.base_box(TEXT_LINE_INNER_PADDING), TEXT_LINE_DISTANCE_THRESHOLD)
+            for i, text_line in enumerate(text_lines)
+        ]
+        character_boxes = [
+            (len(text_lines) + i, box, CHARACTER_DISTANCE_THRESHOLD)
+            for i, character in enumerate(characters)
+            for box in character.boxes
+        ]
+        for i, box, threshold in text_line_boxes + character_boxes:
+            for x in range((box.left - threshold) // self.CELL_SIZE, (box.right + threshold) // self.CELL_SIZE + 1):
+                for y in range((box.top - threshold) // self.CELL_SIZE, (box.bottom + threshold) // self.CELL_SIZE + 1):
+                    cell = self.cells.setdefault((x, y), [])
+                    if not cell or cell[-1] != i:
+                        cell.append(i)
+
+    def get_targets(self, pixel: Pixel) -> tuple[list[TextLine], list[Character]]:
+        """Text lines and characters (in the original order) which may be close enough to the pixel to match it."""
+        indices = self.cells.get((pixel.x // self.CELL_SIZE, pixel.y // self.CELL_SIZE), [])
+        return (
+            [self.text_lines[i] for i in indices if i < len(self.text_lines)],
+            [self.characters[i - len(self.text_lines)] for i in indices if i >= len(self.text_lines)],
+        )
 
 
 def match_line(
-    line: Line, text_lines: list[TextLine], characters: list[Character], image: SimpleImage
+    line: Line, target_index: TargetIndex, image: SimpleImage
 ) -> tuple[list[AnnotatedTarget], list[AnnotatedTarget]]:
     candidates: list[list[AnnotatedTarget]] = [[], []]
     for i, end in enumerate(line):
         if image.is_on_edge(end):
             candidates[i] = [AnnotatedTarget(OFF_PANEL, 0, 0)]
         else:
+            text_lines, characters = target_index.get_targets(end)
+            boxes = [text_line.base_box(TEXT_LINE_INNER_PADDING) for text_line in text_lines]
+            boxes.extend(box for character in characters for box in character.boxes)
+            distances, miss_angle_cosines = get_box_scores(line, i, boxes)
             annotated_targets = [
-                AnnotatedTarget.from_text_line(text_line, line, i)
-                for text_line in text_lines
-            ] + [
-                AnnotatedTarget.from_character(character, line, i)
-                for character in characters
+                AnnotatedTarget(text_line, distances[j], miss_angle_cosines[j], line, i)
+                for j, text_line in enumerate(text_lines)
             ]
+            j = len(text_lines)
+            for character in characters:
+                k = j + len(character.boxes)
+                distance = min((distance for distance in distances[j:k] if distance is not None), default=None)
+                annotated_targets.append(AnnotatedTarget(character, distance, max(miss_angle_cosines[j:k]), line, i))
+                j = k
             filtered_targets = (
                 at
                 for at in annotated_targets
@@ -121,26 +149,36 @@ def match_line(
     return candidates[0], candidates[1]
 
 
-def get_box_distance(box: Box, line: Line, end_no: int) -> float | None:
-    distance = box.distance(line[end_no])
-    if distance is None:
-        return None
-    other_end = line[1 - end_no]
-    other_distance = box.distance(other_end)
-    if other_distance is not None and distance > other_distance:
-        return None
-    return distance
-
-
-def get_miss_angle_cos(box: Box, line: Line, end_no: int) -> float:
-    corners = [box.top_left, box.bottom_left, box.top_right, box.bottom_right]
-    angle_cosines = [get_angle_cos(line, end_no, corner) for corner in corners]
-    max_angle_cos = max(angle_cosines)
-    if max_angle_cos < 0:
-        return max_angle_cos
-    if any(intersects(line, end_no, side) for side in sides(box)):
-        return 1
-    return max_angle_cos
+def get_box_scores(line: Line, end_no: int, boxes: list[Box]) -> tuple[list[float | None], list[float]]:
+    """
+    Distances of the boxes from the given end of the line (None if the box is closer to the other end or the closest
+    side is inactive) and the cosines of the angles by which the line misses them (1 if it points at the box).
+    """
+    this_end = line[end_no]
+    other_end = line[1-end_no]
+    line_x = this_end[0] - other_end[0]
+    line_y = this_end[1] - other_end[1]
+    line_length = math.sqrt(line_x*line_x + line_y*line_y)
+    distances = []
+    miss_angle_cosines = []
+    for box in boxes:
+        distance = box.distance(this_end)
+        if distance is not None:
+            other_distance = box.distance(other_end)
+            if other_distance is not None and distance > other_distance:
+                distance = None
+        distances.append(distance)
+        angle_cosines = []
+        for corner in (box.top_left, box.bottom_left, box.top_right, box.bottom_right):
+            corner_x = corner[0] - this_end[0]
+            corner_y = corner[1] - this_end[1]
+            denominator = line_length * math.sqrt(corner_x*corner_x + corner_y*corner_y)
+            angle_cosines.append(1 if denominator < 0.00001 else (line_x*corner_x + line_y*corner_y)/denominator)
+        max_angle_cos = max(angle_cosines)
+        if max_angle_cos >= 0 and any(intersects(line, end_no, side) for side in sides(box)):
+            max_angle_cos = 1
+        miss_angle_cosines.append(max_angle_cos)
+    return distances, miss_angle_cosines
 
 
 def sides(box: Box) -> list[Line]:
@@ -169,18 +207,6 @@ def intersects(line: Line, end_no: int, segment: Line) -> bool:
     return t > 1
 
 
-def get_angle_cos(line: Line, end_no: int, pixel: Pixel) -> float:
-    this_end = line[end_no]
-    other_end = line[1-end_no]
-    vec1 = (this_end[0] - other_end[0], this_end[1] - other_end[1])
-    vec2 = (pixel[0] - this_end[0], pixel[1] - this_end[1])
-    dot_product = vec1[0] * vec2[0] + vec1[1] * vec2[1]
-    abs1 = math.sqrt(vec1[0]*vec1[0] + vec1[1]*vec1[1])
-    abs2 = math.sqrt(vec2[0]*vec2[0] + vec2[1]*vec2[1])
-    denominator = abs1 * abs2
-    return 1 if denominator < 0.00001 else dot_product/denominator
-
-
 class CandidateResolver:
     def __init__(
         self,
@@ -199,8 +225,10 @@ class CandidateResolver:
                 updated_candidates.append((candidates1, candidates2))
             else:
                 unmatched_lines.append(line)
+        dependent_pairs = self.get_dependent_pairs(updated_candidates)
+        worklist = set(range(len(updated_candidates)))
         while not self.is_all_resolved(updated_candidates):
-            changed, updated_candidates = self.resolve_candidates(updated_candidates)
+            changed, worklist = self.resolve_candidates(updated_candidates, worklist, dependent_pairs)
             if not changed:
                 for candidates1, candidates2 in updated_candidates:
                     if len(candidates1) > 1 or len(candidates2) > 1:
@@ -210,22 +238,58 @@ class CandidateResolver:
         choices = [(candidates1[0].target, candidates2[0].target) for candidates1, candidates2 in updated_candidates]
         return choices, unmatched_lines
 
-    def resolve_candidates(
+    def get_dependent_pairs(
         self, candidates_pairs: list[tuple[list[AnnotatedTarget], list[AnnotatedTarget]]]
-    ) -> tuple[bool, list[tuple[list[AnnotatedTarget], list[AnnotatedTarget]]]]:
-        updated_candidates_pairs = []
+    ) -> dict[TextBlock, list[int]]:
+        """Indices of the candidate pairs whose resolution depends on whether the given block is matched."""
+        dependent_pairs: dict[TextBlock, list[int]] = {}
+        for i, (candidates1, candidates2) in enumerate(candidates_pairs):
+            blocks = {self.block_mapping[c.target] for c in candidates1 + candidates2 if isinstance(c.target, TextLine)}
+            for block in blocks:
+                dependent_pairs.setdefault(block, []).append(i)
+        return dependent_pairs
+
+    def resolve_candidates(
+        self,
+        candidates_pairs: list[tuple[list[AnnotatedTarget], list[AnnotatedTarget]]],
+        worklist: set[int],
+        dependent_pairs: dict[TextBlock, list[int]],
+    ) -> tuple[bool, set[int]]:
+        """
+        A single pass over the candidate pairs (in order, updating them in place), resolving only the pairs in the
+        worklist and the later pairs depending on a block matched during the pass. Any other pair would come out the
+        same, since neither its candidates nor the matched blocks it depends on changed since it was last resolved.
+        Returns whether anything changed and the worklist for the next pass.
+        """
+        queue = sorted(worklist)
+        queued = set(worklist)
+        next_worklist = set()
         changed = False
-        for candidates1, candidates2 in candidates_pairs:
+        while queue:
+            i = heappop(queue)
+            candidates1, candidates2 = candidates_pairs[i]
             best_candidates1 = self.best_candidates(candidates1, candidates2)
             best_candidates2 = self.best_candidates(candidates2, best_candidates1)
             if len(best_candidates1) < len(candidates1) or len(best_candidates2) < len(candidates2):
                 changed = True
-            updated_candidates_pairs.append((best_candidates1, best_candidates2))
+            if not (self.is_same(best_candidates1, candidates1) and self.is_same(best_candidates2, candidates2)):
+                next_worklist.add(i)
+            candidates_pairs[i] = (best_candidates1, best_candidates2)
             for best_candidates in (best_candidates1, best_candidates2):
                 if len(best_candidates) == 1 and isinstance(best_candidates[0].target, TextLine):
                     if self.update_matched_blocks(best_candidates[0].target):
                         changed = True
-        return changed, updated_candidates_pairs
+                        for j in dependent_pairs[self.block_mapping[best_candidates[0].target]]:
+                            if j <= i:
+                                next_worklist.add(j)
+                            elif j not in queued:
+                                heappush(queue, j)
+                                queued.add(j)
+        return changed, next_worklist
+
+    @staticmethod
+    def is_same(candidates1: list[AnnotatedTarget], candidates2: list[AnnotatedTarget]) -> bool:
+        return len(candidates1) == len(candidates2) and all(c1 is c2 for c1, c2 in zip(candidates1, candidates2))
 
     def force_resolve_candidates(
         self, candidates_pairs: list[tuple[list[AnnotatedTarget], list[AnnotatedTarget]]]
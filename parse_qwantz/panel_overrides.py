@@ -1,11 +1,20 @@
+import hashlib
 import json
+import re
 from functools import cache
 from importlib.resources import files, as_file
+from pathlib import Path
+
+from PIL import Image
 
 import parse_qwantz
+from parse_qwantz import persistent_cache
 
 OVERRIDE_FILE_PATH = files(parse_qwantz).joinpath('data/panel_overrides.json')
 
+# one small file per image, so that concurrent workers never overwrite each other's entries
+DIGESTS_DIR = 'image_digests'
+
 
 @cache
 def get_panel_overrides() -> dict[str, dict[str, list[str]]]:
@@ -14,3 +23,35 @@ def get_panel_overrides() -> dict[str, dict[str, list[str]]]:
             key: value["panels"]
             for key, value in json.load(open(override_path)).items()
         }
+
+
+def get_image_md5(image: Image.Image) -> str:
+    """
+    The md5 of the decoded pixels, which is what the overrides are keyed by.
+    For images opened from a file, it's cached by a digest of the file's contents,
+    so that the image is only decoded the first time it's seen.
+    """
+    file_key = get_file_key(image)
+    if file_key is not None:
+        cached = persistent_cache.read_bytes(f'{DIGESTS_DIR}/{file_key}')
+        if cached is not None and re.fullmatch(rb'[0-9a-f]{32}', cached):
+            return cached.decode()
+    md5 = hashlib.md5(image.tobytes()).hexdigest()
+    if file_key is not None:
+        persistent_cache.write_bytes(f'{DIGESTS_DIR}/{file_key}', md5.encode())
+    return md5
+
+
+def get_file_key(image: Image.Image) -> str | None:
+    file_name = getattr(image, 'filename', None)
+    if not file_name:
+        return None
+    try:
+        content = Path(file_name).read_bytes()
+    except OSError:
+        return None
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def is_fully_overridden(panel_overrides: dict[str, list[str]]) -> bool:
+    return all(str(panel_no) in panel_overrides for panel_no in range(1, 7))
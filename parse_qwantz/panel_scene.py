@@ -0,0 +1,64 @@
+from parse_qwantz.box import Box
+from parse_qwantz.colors import Color
+from parse_qwantz.lines import Line
+from parse_qwantz.match_lines import Character
+from parse_qwantz.simple_image import SimpleImage
+from parse_qwantz.text_blocks import TextBlock, Alignment, get_text_blocks, sort_text_blocks
+from parse_qwantz.text_lines import TextLine
+
+
+class PanelScene:
+    """
+    Everything in a panel that takes part in matching text to characters, shared by all the matching steps. The
+    text line to block index is kept up to date when blocks are split.
+    """
+    def __init__(
+        self,
+        image: SimpleImage,
+        lines: list[Line],
+        thoughts: list[Box],
+        characters: list[Character],
+        text_blocks: list[TextBlock],
+    ):
+        self.image = image
+        self.lines = lines
+        self.thoughts = thoughts
+        self.characters = characters
+        self.blocks = list(text_blocks)
+        self.block_by_line: dict[TextLine, TextBlock] = {}
+        for block in self.blocks:
+            self.add_to_index(block)
+        # matched blocks by font group and color, in the order they were matched
+        self.matched_blocks_by_style: dict[tuple[str, Color], list[TextBlock]] = {}
+
+    @classmethod
+    def from_elements(
+        cls,
+        image: SimpleImage,
+        lines: list[Line],
+        thoughts: list[Box],
+        characters: list[Character],
+        text_lines: list[TextLine],
+    ) -> "PanelScene":
+        return cls(image, lines, thoughts, characters, sort_text_blocks(get_text_blocks(text_lines)))
+
+    def get_block(self, text_line: TextLine) -> TextBlock:
+        return self.block_by_line[text_line]
+
+    def get_matched_blocks_with_style(self, block: TextBlock) -> list[TextBlock]:
+        return self.matched_blocks_by_style.get((block.font.group, block.color), [])
+
+    def add_match(self, block: TextBlock) -> None:
+        self.matched_blocks_by_style.setdefault((block.font.group, block.color), []).append(block)
+
+    def split_block(self, block: TextBlock, line1: TextLine, line2: TextLine) -> tuple[TextBlock, TextBlock, Alignment]:
+        block1, block2, alignment = block.split(line1, line2)
+        index = self.blocks.index(block)
+        self.blocks[index:index + 1] = [block1, block2]
+        self.add_to_index(block1)
+        self.add_to_index(block2)
+        return block1, block2, alignment
+
+    def add_to_index(self, block: TextBlock) -> None:
+        for text_line in block.lines:
+            self.block_by_line[text_line] = block
@@ -1,4 +1,3 @@
-import hashlib
 import logging
 from dataclasses import dataclass
 from typing import Iterable
@@ -13,13 +12,14 @@ from parse_qwantz.lines import Line
 from parse_qwantz.match_blocks import match_blocks
 from parse_qwantz.match_lines import Character, match_lines, OFF_PANEL
 from parse_qwantz.match_thought import match_thought
+from parse_qwantz.panel_scene import PanelScene
 from parse_qwantz.panels import PANELS, CHARACTERS, FOOTER
-from parse_qwantz.panel_overrides import get_panel_overrides
+from parse_qwantz.panel_overrides import get_panel_overrides, get_image_md5, is_fully_overridden
 from parse_qwantz.pixels import is_ask_professor_science, Pixel
-from parse_qwantz.prepare_image import prepare_image
+from parse_qwantz.prepare_image import prepare_image, get_masked_panel
 from parse_qwantz.shape import get_box
 from parse_qwantz.simple_image import SimpleImage
-from parse_qwantz.text_blocks import TextBlock, sort_text_blocks, get_text_blocks
+from parse_qwantz.text_blocks import TextBlock, sort_text_blocks
 from parse_qwantz.text_lines import TextLine
 
 logger = logging.getLogger()
@@ -28,8 +28,11 @@ logger = logging.getLogger()
 def parse_qwantz(
     image: Image.Image, debug: bool = False, log_colors: bool = False, ignore_overrides: bool = False
 ) -> Iterable[list[str]]:
-    md5 = hashlib.md5(image.tobytes()).hexdigest()
-    panel_overrides = get_panel_overrides().get(md5, {}) if not ignore_overrides else {}
+    panel_overrides = get_panel_overrides().get(get_image_md5(image), {}) if not ignore_overrides else {}
+    if is_fully_overridden(panel_overrides):
+        for i in range(1, 7):
+            yield panel_overrides[str(i)]
+        return
     masked, good_panels = prepare_image(image, skip_template_validation=ignore_overrides)
     for i, (panel, characters) in enumerate(zip(PANELS, CHARACTERS), start=1):
         if str(i) in panel_overrides:
@@ -40,9 +43,8 @@ def parse_qwantz(
             continue
         set_current_panel(i, log_colors)
         (width, height), (x, y) = panel
-        cropped = masked.crop((x, y, x + width, y + height))
-        ask_professor_science = is_ask_professor_science(cropped)
-        panel_image = SimpleImage.from_image(cropped, ask_professor_science)
+        ask_professor_science = is_ask_professor_science(image, Pixel(x, y))
+        panel_image = SimpleImage.from_bit_image(masked.crop(x, y, width, height), ask_professor_science)
         lines, _widths, thoughts, text_lines, extra_characters, unmatched_shapes = get_elements(panel_image)
         text_blocks, block_matches, thought_blocks, unmatched_stuff = match_stuff(
             characters + extra_characters, panel_image, lines, text_lines, thoughts
@@ -52,7 +54,10 @@ def parse_qwantz(
                 logger.warning(f"Variant used: {extra_info}")
         script_lines = list(get_script_lines(text_blocks, block_matches, thought_blocks, ask_professor_science))
         if debug and (unmatched_shapes or unmatched_stuff):
-            handle_debug(cropped, text_blocks, unmatched_shapes, unmatched_stuff, characters + extra_characters)
+            handle_debug(
+                get_masked_panel(image, panel), text_blocks, unmatched_shapes, unmatched_stuff,
+                characters + extra_characters,
+            )
         if script_lines:
             yield list(script_lines)
         else:
@@ -60,14 +65,12 @@ def parse_qwantz(
 
 
 def parse_footer(image: Image.Image) -> list[str]:
-    md5 = hashlib.md5(image.tobytes()).hexdigest()
-    panel_overrides = get_panel_overrides().get(md5, {})
+    panel_overrides = get_panel_overrides().get(get_image_md5(image), {})
     if "footer" in panel_overrides:
         return panel_overrides["footer"]
     masked, _ = prepare_image(image)
     (width, height), (x, y) = FOOTER
-    cropped = masked.crop((x, y, x + width, y + height))
-    footer_image = SimpleImage.from_image(cropped)
+    footer_image = SimpleImage.from_bit_image(masked.crop(x, y, width, height))
     lines, _widths, thoughts, text_lines, extra_characters, unmatched_shapes = get_elements(footer_image)
     if lines or thoughts or extra_characters or unmatched_shapes:
         logger.warning("Unexpected elements in footer")
@@ -103,19 +106,19 @@ def match_stuff(
     list[TextBlock],
     UnmatchedStuff,
 ]:
-    text_blocks = sort_text_blocks(get_text_blocks(text_lines))
-    line_matches, unmatched_lines = match_lines(lines, text_blocks, characters, image)
-    block_matches, text_blocks, unmatched_neighbors = match_blocks(line_matches, text_blocks)
-    text_blocks = sort_text_blocks(text_blocks)
+    scene = PanelScene.from_elements(image, lines, thoughts, characters, text_lines)
+    line_matches, unmatched_lines = match_lines(scene)
+    block_matches, unmatched_neighbors = match_blocks(line_matches, scene)
+    text_blocks = sort_text_blocks(scene.blocks)
     unmatched_blocks = [block for block in text_blocks if block not in block_matches]
-    thought_matches = list(match_thought(thoughts, unmatched_blocks))
+    thought_matches = list(match_thought(scene.thoughts, unmatched_blocks))
     if thoughts and not thought_matches:
         logger.warning("Detected thought bubbles, but no thought text")
         unmatched_thoughts = thoughts
     else:
         unmatched_thoughts = []
     unmatched_blocks = [block for block in unmatched_blocks if block not in thought_matches]
-    match_above_or_below(unmatched_blocks, block_matches)
+    match_above_or_below(unmatched_blocks, block_matches, scene)
     unmatched_stuff = UnmatchedStuff(unmatched_neighbors, unmatched_lines, unmatched_thoughts)
     return text_blocks, block_matches, thought_matches, unmatched_stuff
 
@@ -194,27 +197,29 @@ def handle_debug(
     image.show()
 
 
-def match_above_or_below(unmatched_blocks: list[TextBlock], block_matches: dict[TextBlock, list[Character]]) -> None:
+def match_above_or_below(
+    unmatched_blocks: list[TextBlock], block_matches: dict[TextBlock, list[Character]], scene: PanelScene
+) -> None:
     for unmatched_block in unmatched_blocks:
         box = unmatched_block.box
         closest = None
         best_distance = None
         if not unmatched_block.is_bold:
-            for block, characters in block_matches.items():
-                if not characters:
-                    continue
-                if block.font.group != unmatched_block.font.group or block.color != unmatched_block.color:
+            # ties are broken by the order of block_matches
+            for block in scene.get_matched_blocks_with_style(unmatched_block):
+                if not block_matches[block]:
                     continue
                 other_box = block.box
                 if get_interval_distance((box.left, box.right), (other_box.left, other_box.right)) == 0:
                     distance = max(other_box.top - box.bottom, box.top - other_box.bottom)
                     line_height = max(unmatched_block.font.height, block.font.height)
                     if distance < line_height * 2 and (best_distance is None or distance < best_distance):
-                        closest = characters
+                        closest = block_matches[block]
                         best_distance = distance
         if closest:
             logger.warning("Matching disconnected blocks")
             block_matches[unmatched_block] = closest
+            scene.add_match(unmatched_block)
 
 
 def handle_god_and_devil(block: TextBlock, content: str, is_off_panel: bool) -> Character | None:
@@ -0,0 +1,77 @@
+import json
+import logging
+import mmap
+import os
+import tempfile
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger()
+
+CACHE_VERSION = 1
+
+
+def get_cache_dir() -> Path | None:
+    """
+    Directory for persistent caches: $PARSE_QWANTZ_CACHE_DIR, or parse_qwantz/v<CACHE_VERSION> in the user cache
+    directory. Setting PARSE_QWANTZ_CACHE_DIR to an empty string disables persistent caching.
+    """
+    cache_dir = os.environ.get('PARSE_QWANTZ_CACHE_DIR')
+    if cache_dir == '':
+        return None
+    if cache_dir is None:
+        base_dir = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+        cache_dir = Path(base_dir) / 'parse_qwantz'
+    return Path(cache_dir) / f'v{CACHE_VERSION}'
+
+
+def read_json(name: str) -> Any | None:
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return None
+    try:
+        with open(cache_dir / name) as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+
+
+def read_bytes(name: str) -> bytes | None:
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return None
+    try:
+        return (cache_dir / name).read_bytes()
+    except OSError:
+        return None
+
+
+def map_bytes(name: str) -> mmap.mmap | None:
+    """Read-only memory map of a cache file, whose pages are shared by all the processes mapping it."""
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return None
+    try:
+        with open(cache_dir / name, 'rb') as cache_file:
+            return mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+
+def write_bytes(name: str, content: bytes) -> None:
+    # write to a temporary file and rename it, so that concurrent workers never see a partial file
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return
+    path = cache_dir / name
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f'.{path.name}.', delete=False) as tmp_file:
+            tmp_file.write(content)
+        os.replace(tmp_file.name, path)
+    except OSError as e:
+        logger.info(f"Could not write cache file {name}: {e}")
+
+
+def write_json(name: str, content: Any) -> None:
+    write_bytes(name, json.dumps(content).encode())
@@ -1,13 +1,16 @@
+import re
 from functools import cache
 from logging import getLogger
-from typing import Iterable, NamedTuple
+from typing import Iterable, Iterator, NamedTuple
 
-from PIL import Image
+from PIL import Image, ImageChops
 
-from parse_qwantz.colors import Color, square_distance, get_color_with_threshold, WHITE
+from parse_qwantz.colors import Color, square_distance, get_color_with_threshold, WHITE, INK_COLORS
 
 logger = getLogger()
 
+NON_WHITE_TABLE = bytes([1] * 255 + [0])
+
 
 class Pixel(NamedTuple):
     x: int
@@ -19,24 +22,62 @@ class UnknownColor(ValueError):
 
 
 def get_pixels(image: Image.Image) -> Iterable[tuple[Pixel, Color]]:
-    palette = image.getpalette()
-    palette = tuple(palette) if palette else None
-    values = image.getdata()
     width = image.width
+    for i, color in get_ink(image):
+        yield Pixel(i % width, i // width), color
+
+
+def get_ink(image: Image.Image) -> Iterator[tuple[int, Color]]:
     unknown_colors = False
-    for i, value in enumerate(values):
-        x = i % width
-        y = i // width
-        value = normalize_color(value, palette)
-        if value != WHITE:
-            color = get_color_with_threshold(value)
-            if not color:
-                if not unknown_colors:
-                    unknown_colors = True
-                    logger.warning(f"Unknown color at {(x, y)}: {value}.")
-                color = Color(*value)
-            if color != WHITE:
-                yield Pixel(x, y), color
+    for i, color in classify_ink(image):
+        if not unknown_colors and color not in INK_COLORS:
+            unknown_colors = True
+            logger.warning(f"Unknown color at {(i % image.width, i // image.width)}: {tuple(color)}.")
+        yield i, color
+
+
+def classify_ink(image: Image.Image, visible: bytes | None = None) -> Iterator[tuple[int, Color]]:
+    """
+    Yield (offset, color) for every non-white pixel, in raster order.
+    `visible` has one 0/1 byte per pixel, pixels marked with 0 are skipped.
+    """
+    if image.mode == 'P':
+        table = get_palette_table(bytes(image.getpalette() or ()))
+        data = image.tobytes()
+        candidates = data.translate(bytes(color is not None for color in table))
+    else:
+        rgb_image = image.convert('RGB')
+        red, green, blue = rgb_image.split()
+        # pure white pixels are the vast majority, so only look at the others
+        darkest = ImageChops.darker(ImageChops.darker(red, green), blue).tobytes()
+        candidates = darkest.translate(NON_WHITE_TABLE)
+        table = None
+        data = rgb_image.tobytes()
+    if visible is not None:
+        candidates_bits = int.from_bytes(candidates, 'big') & int.from_bytes(visible, 'big')
+        candidates = candidates_bits.to_bytes(len(candidates), 'big')
+    for run in re.finditer(rb'[^\x00]+', candidates):
+        for i in range(run.start(), run.end()):
+            color = table[data[i]] if table else classify_color(data[i * 3: i * 3 + 3])
+            if color is not None:
+                yield i, color
+
+
+@cache
+def get_palette_table(palette: bytes) -> tuple[Color | None, ...]:
+    """Classify every palette entry; None stands for white."""
+    table = tuple(classify_color(palette[i: i + 3]) for i in range(0, len(palette) - 2, 3))
+    return table + (None,) * (256 - len(table))
+
+
+@cache
+def classify_color(rgb: bytes) -> Color | None:
+    if rgb == b'\xff\xff\xff':
+        return None
+    color = get_color_with_threshold(tuple(rgb))
+    if color is None:
+        return Color(*rgb)
+    return color if color != WHITE else None
 
 
 @cache
@@ -52,27 +93,12 @@ def normalize_color(
     return color
 
 
-def remove_subsequence(sorted_pixels: list[Pixel], subsequence: list[Pixel]) -> list[Pixel]:
-    sub_iter = iter(subsequence)
-    next_pixel = next(sub_iter)
-    pixels = []
-    for pixel in sorted_pixels:
-        while next_pixel is not None and pixel > next_pixel:
-            try:
-                next_pixel = next(sub_iter)
-            except StopIteration:
-                next_pixel = None
-        if pixel != next_pixel:
-            pixels.append(pixel)
-    return pixels
-
-
-def is_ask_professor_science(image: Image.Image) -> bool:
+def is_ask_professor_science(image: Image.Image, origin: Pixel = Pixel(0, 0)) -> bool:
     palette = image.getpalette()
     palette = tuple(palette) if palette else None
     for x in range(109, 113):
         for y in range(1, 6):
-            pixel_color = normalize_color(image.getpixel((x, y)), palette)
+            pixel_color = normalize_color(image.getpixel((origin.x + x, origin.y + y)), palette)
             if square_distance(pixel_color, (224, 231, 248)) <= 3:
                 return True
             if square_distance(pixel_color, (209, 220, 244)) <= 3:
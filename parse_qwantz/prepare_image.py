@@ -6,7 +6,8 @@ from PIL import Image
 
 import parse_qwantz
 from parse_qwantz.colors import square_distance, COLOR_THRESHOLD
-from parse_qwantz.pixels import normalize_color
+from parse_qwantz.pixels import normalize_color, classify_ink
+from parse_qwantz.simple_image import BitImage
 
 logger = logging.getLogger()
 
@@ -34,7 +35,13 @@ def get_mask_image() -> Image.Image:
         return Image.open(image_path)
 
 
-def prepare_image(image: Image.Image, skip_template_validation: bool = False) -> tuple[Image.Image, list[int]]:
+@cache
+def get_visible_mask() -> bytes:
+    """One byte per pixel of the comic: 1 if it's inside a panel (or the footer), 0 otherwise."""
+    return get_mask_image().convert('L').tobytes().translate(bytes(value == 255 for value in range(256)))
+
+
+def prepare_image(image: Image.Image, skip_template_validation: bool = False) -> tuple[BitImage, list[int]]:
     if image.size != DIM:
         logger.error(f"Wrong image dimensions: {image.size}, only {DIM} is valid")
         raise ImageError(f"Wrong image dimensions: {image.size}, only {DIM} is valid")
@@ -54,5 +61,11 @@ def prepare_image(image: Image.Image, skip_template_validation: bool = False) ->
     if not good_panels:
         logger.error("Invalid template")
         raise ImageError(f"Invalid template")
-    all_white = Image.new(mode='RGB', size=DIM, color=(255, 255, 255))
-    return Image.composite(image, all_white, get_mask_image()), good_panels
+    return BitImage.from_ink(*DIM, classify_ink(image, visible=get_visible_mask())), good_panels
+
+
+def get_masked_panel(image: Image.Image, panel: tuple[tuple[int, int], tuple[int, int]]) -> Image.Image:
+    (width, height), (x, y) = panel
+    box = (x, y, x + width, y + height)
+    all_white = Image.new(mode='RGB', size=(width, height), color=(255, 255, 255))
+    return Image.composite(image.crop(box), all_white, get_mask_image().crop(box))
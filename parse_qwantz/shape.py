@@ -1,4 +1,8 @@
-from typing import Collection
+import math
+from bisect import bisect_right, insort
+from functools import cached_property
+from itertools import count
+from typing import Collection, Iterable
 
 from parse_qwantz.box import Box
 from parse_qwantz.colors import Color
@@ -48,3 +52,162 @@ def get_neighbor_pixels(pixel: Pixel) -> list[Pixel]:
         Pixel(x + 1, y),
         Pixel(x + 1, y + 1),
     ]
+
+
+class Component:
+    """A connected component, stored as horizontal runs of ink: (y, x_start, x_end), both ends inclusive."""
+
+    def __init__(self, runs: list[tuple[int, int, int]], image: SimpleImage):
+        self.runs = runs
+        self.image = image
+
+    @cached_property
+    def pixels(self) -> dict[Pixel, Color]:
+        colors = self.image.pixels
+        return {
+            pixel: colors[pixel]
+            for y, start, end in self.runs
+            for pixel in (Pixel(x, y) for x in range(start, end + 1))
+        }
+
+    @cached_property
+    def box(self) -> Box:
+        return Box(
+            Pixel(min(start for _, start, _ in self.runs), min(y for y, _, _ in self.runs)),
+            Pixel(max(end for _, _, end in self.runs) + 1, max(y for y, _, _ in self.runs) + 1),
+        )
+
+    @cached_property
+    def size(self) -> int:
+        return sum(end - start + 1 for _, start, end in self.runs)
+
+    @cached_property
+    def is_uniform(self) -> bool:
+        return len(set(self.pixels.values())) == 1
+
+    @classmethod
+    def from_pixels(cls, pixels: dict[Pixel, Color], image: SimpleImage) -> "Component":
+        component = cls([(y, x, x) for x, y in pixels], image)
+        component.pixels = pixels
+        return component
+
+
+class ComponentLabels:
+    """
+    Connected components (in the sense of get_shape) of the ink in an image, labeled in a single scanline
+    union-find pass over runs of ink instead of one flood fill per query.
+    Pixels may be removed later on; components that lost pixels are relabeled when they're looked up.
+    """
+
+    def __init__(self, image: SimpleImage):
+        self.image = image
+        # for each row, sorted (x_start, x_end, label) runs
+        self.row_runs: dict[int, list[tuple[int, int, int]]] = {}
+        self.components: dict[int, Component] = {}
+        # removed pixels as row bitmasks
+        self.removed: dict[int, int] = {}
+        self.next_ids = count()
+        self.label(image.pixels)
+
+    def get_label(self, pixel: Pixel) -> int:
+        x, y = pixel
+        row_runs = self.row_runs.get(y, [])
+        i = bisect_right(row_runs, (x, math.inf))
+        if i == 0 or x > row_runs[i - 1][1]:
+            raise KeyError(pixel)
+        _start, _end, label = row_runs[i - 1]
+        return label
+
+    def get_component(self, pixel: Pixel) -> Component:
+        label = self.get_label(pixel)
+        component = self.components[label]
+        if any(self.removed.get(y, 0) >> start & (1 << end - start + 1) - 1 for y, start, end in component.runs):
+            self.forget(label)
+            self.label([other for other in component.pixels if not self.is_removed(other)])
+            component = self.components[self.get_label(pixel)]
+        return component
+
+    def is_removed(self, pixel: Pixel) -> bool:
+        x, y = pixel
+        return self.removed.get(y, 0) >> x & 1 == 1
+
+    def remove_pixels(self, pixels: Iterable[Pixel]) -> None:
+        removed = self.removed
+        for x, y in pixels:
+            removed[y] = removed.get(y, 0) | 1 << x
+
+    def remove_columns(self, y0: int, height: int, columns: Iterable[tuple[int, int]]) -> None:
+        """Remove (x, column) pairs, columns as returned by SimpleImage.get_column(x, y0, height)."""
+        removed = self.removed
+        bottom = y0 + height - 1
+        for x, column in columns:
+            while column:
+                bit = column & -column
+                y = bottom - (bit.bit_length() - 1)
+                removed[y] = removed.get(y, 0) | 1 << x
+                column ^= bit
+
+    def remove_component(self, component: Component) -> None:
+        y, x, _ = component.runs[0]
+        self.forget(self.get_label(Pixel(x, y)))
+        self.remove_pixels(component.pixels)
+
+    def forget(self, label: int) -> Component:
+        component = self.components.pop(label)
+        for y in {y for y, _, _ in component.runs}:
+            self.row_runs[y] = [run for run in self.row_runs[y] if run[2] != label]
+        return component
+
+    def label(self, pixels: Iterable[Pixel]) -> None:
+        rows: dict[int, int] = {}
+        for x, y in pixels:
+            rows[y] = rows.get(y, 0) | 1 << x
+        runs: list[tuple[int, int, int]] = []
+        parents: list[int] = []
+
+        def find(run: int) -> int:
+            while parents[run] != run:
+                parents[run] = parents[parents[run]]
+                run = parents[run]
+            return run
+
+        previous_runs: list[int] = []
+        for y in sorted(rows):
+            if y - 1 not in rows:
+                previous_runs = []
+            current_runs = []
+            first_candidate = 0
+            for start, end in get_row_runs(rows[y]):
+                run = len(runs)
+                runs.append((y, start, end))
+                parents.append(run)
+                current_runs.append(run)
+                # 8-connectivity: touching runs in the row above, including diagonally
+                while first_candidate < len(previous_runs) and runs[previous_runs[first_candidate]][2] < start - 1:
+                    first_candidate += 1
+                for previous_run in previous_runs[first_candidate:]:
+                    if runs[previous_run][1] > end + 1:
+                        break
+                    root1, root2 = find(previous_run), find(run)
+                    if root1 != root2:
+                        parents[root2] = root1
+            previous_runs = current_runs
+        components: dict[int, list[tuple[int, int, int]]] = {}
+        for run, run_bounds in enumerate(runs):
+            components.setdefault(find(run), []).append(run_bounds)
+        for component_runs in components.values():
+            label = next(self.next_ids)
+            self.components[label] = Component(component_runs, self.image)
+            for y, start, end in component_runs:
+                insort(self.row_runs.setdefault(y, []), (start, end, label))
+
+
+def get_row_runs(row: int) -> Iterable[tuple[int, int]]:
+    starts = row & ~(row << 1)
+    ends = row & ~(row >> 1)
+    while starts:
+        start_bit = starts & -starts
+        end_bit = ends & -ends
+        yield start_bit.bit_length() - 1, end_bit.bit_length() - 1
+        starts ^= start_bit
+        ends ^= end_bit
@@ -1,16 +1,24 @@
+from collections.abc import Iterator, Mapping
 from dataclasses import dataclass
+from functools import cached_property
+
+from logging import getLogger
+from typing import Iterable
 
 from PIL import Image
 
-from parse_qwantz.colors import Color, WHITE
-from parse_qwantz.pixels import Pixel, get_pixels
+from parse_qwantz.box import Box
+from parse_qwantz.colors import Color, WHITE, INK_COLORS
+from parse_qwantz.pixels import Pixel, get_pixels, get_ink
+
+logger = getLogger()
 
 
 @dataclass
 class SimpleImage:
     width: int
     height: int
-    pixels: dict[Pixel, Color]
+    pixels: Mapping[Pixel, Color]
 
     @classmethod
     def from_image(cls, image: Image.Image, trim_top: bool = False):
@@ -20,13 +28,266 @@ class SimpleImage:
             pixels = dict(get_pixels(image))
         return cls(image.width, image.height, pixels)
 
+    @classmethod
+    def from_bit_image(cls, image: "BitImage", trim_top: bool = False):
+        unknown_pixels = [
+            (pixel, color) for color, plane in image.planes.items()
+            if color not in INK_COLORS and (pixel := get_first_pixel(plane))
+        ]
+        if unknown_pixels:
+            (x, y), color = min(unknown_pixels, key=lambda p: (p[0].y, p[0].x))
+            logger.warning(f"Unknown color at {(x, y)}: {tuple(color)}.")
+        if trim_top:
+            image = image.trimmed_top()
+        pixels = {pixel: image.get_pixel(pixel) for pixel in image.pixels}
+        return cls(image.width, image.height, pixels)
+
     def get_pixel(self, pixel: Pixel) -> Color:
         # caution: no bounds checking!
         return self.pixels.get(pixel, WHITE)
 
+    @cached_property
+    def columns(self) -> list[int]:
+        """Column-major bitmasks: bit (height - 1 - y) of columns[x] is set iff (x, y) is ink."""
+        columns = [0] * self.width
+        for x, y in self.pixels:
+            columns[x] |= 1 << (self.height - 1 - y)
+        return columns
+
+    def get_column(self, x: int, y0: int, height: int) -> int:
+        """Pixels (x, y0)..(x, y0 + height - 1) as a bitmask, top pixel in the most significant bit."""
+        if not 0 <= x < self.width:
+            return 0
+        shift = self.height - y0 - height
+        column = self.columns[x] >> shift if shift >= 0 else self.columns[x] << -shift
+        return column & ((1 << height) - 1)
+
+    def get_columns(self, x0: int, x1: int, y0: int, height: int) -> list[int]:
+        """Same as [get_column(x, y0, height) for x in range(x0, x1)]."""
+        shift = self.height - y0 - height
+        mask = (1 << height) - 1
+        columns = self.columns[max(x0, 0):max(x1, 0)]
+        if shift >= 0:
+            columns = [column >> shift & mask for column in columns]
+        else:
+            columns = [column << -shift & mask for column in columns]
+        return [0] * (min(x1, 0) - x0) + columns + [0] * (x1 - max(x0, self.width))
+
     def is_on_edge(self, pixel: Pixel) -> bool:
         x, y = pixel
         return x in (0, self.width - 1) or y in (0, self.height - 1)
 
     def distance_to_edge(self, pixel: Pixel) -> int:
         return min(pixel.x, pixel.y, self.width - pixel.x - 1, self.height - pixel.y - 1)
+
+
+@dataclass
+class RemainingInk(SimpleImage):
+    """
+    The ink that hasn't been assigned to any element yet.
+    The ink is kept in the column bitmasks (pixels is a view of them), so consuming pixels only clears bits.
+    Seeds come in (x, y) order.
+    """
+    ink_columns: list[int]
+    sorted_pixels: list[Pixel]
+    seed_index: int = 0
+
+    @property
+    def columns(self) -> list[int]:
+        """The ink left, kept up to date as it's consumed (rather than derived from the pixels once)."""
+        return self.ink_columns
+
+    @classmethod
+    def from_simple_image(cls, image: SimpleImage) -> "RemainingInk":
+        columns = list(image.columns)
+        return cls(
+            image.width,
+            image.height,
+            RemainingPixels(image.pixels, columns, image.height),
+            columns,
+            sorted(image.pixels),
+        )
+
+    def next_seed(self) -> Pixel | None:
+        while self.seed_index < len(self.sorted_pixels):
+            x, y = self.sorted_pixels[self.seed_index]
+            if self.ink_columns[x] >> (self.height - 1 - y) & 1:
+                return Pixel(x, y)
+            self.seed_index += 1
+        return None
+
+    def consume(self, pixels: Iterable[Pixel]) -> None:
+        columns = self.ink_columns
+        for x, y in pixels:
+            columns[x] &= ~(1 << (self.height - 1 - y))
+
+    def consume_columns(self, y0: int, height: int, columns: Iterable[tuple[int, int]]) -> None:
+        """Consume (x, column) pairs, columns as returned by get_column(x, y0, height)."""
+        shift = self.height - y0 - height
+        for x, column in columns:
+            self.ink_columns[x] &= ~(column << shift if shift >= 0 else column >> -shift)
+
+
+class RemainingPixels(Mapping[Pixel, Color]):
+    """Dict-like view of the pixels still set in a column table, with their colors from the original image."""
+
+    def __init__(self, colors: Mapping[Pixel, Color], columns: list[int], height: int):
+        self._colors = colors
+        self._columns = columns
+        self._height = height
+
+    def __getitem__(self, pixel: Pixel) -> Color:
+        if pixel not in self:
+            raise KeyError(pixel)
+        return self._colors[pixel]
+
+    def get(self, pixel: Pixel, default: Color | None = None) -> Color | None:
+        return self._colors[pixel] if pixel in self else default
+
+    def __contains__(self, pixel: object) -> bool:
+        x, y = pixel
+        return 0 <= x < len(self._columns) and 0 <= y < self._height and self._columns[x] >> (self._height - 1 - y) & 1 == 1
+
+    def __iter__(self) -> Iterator[Pixel]:
+        return (pixel for pixel in self._colors if pixel in self)
+
+    def __len__(self) -> int:
+        return sum(column.bit_count() for column in self._columns)
+
+
+@dataclass
+class BitImage:
+    """
+    Same interface as SimpleImage, but each color is stored as a plane of row bitmasks:
+    bit x of planes[color][y] is set iff pixel (x, y) has that color.
+    """
+    width: int
+    height: int
+    planes: dict[Color, list[int]]
+
+    @classmethod
+    def from_image(cls, image: Image.Image, trim_top: bool = False):
+        bit_image = cls.from_ink(image.width, image.height, get_ink(image))
+        return bit_image.trimmed_top() if trim_top else bit_image
+
+    @classmethod
+    def from_ink(cls, width: int, height: int, ink: Iterable[tuple[int, Color]]):
+        planes: dict[Color, list[int]] = {}
+        for i, color in ink:
+            y, x = divmod(i, width)
+            if color not in planes:
+                planes[color] = [0] * height
+            planes[color][y] |= 1 << x
+        return cls(width, height, planes)
+
+    @classmethod
+    def from_simple_image(cls, image: SimpleImage):
+        planes: dict[Color, list[int]] = {}
+        for (x, y), color in image.pixels.items():
+            if color not in planes:
+                planes[color] = [0] * image.height
+            planes[color][y] |= 1 << x
+        return cls(image.width, image.height, planes)
+
+    def crop(self, x: int, y: int, width: int, height: int) -> "BitImage":
+        mask = (1 << width) - 1
+        planes = {}
+        for color, plane in self.planes.items():
+            rows = [row >> x & mask for row in plane[y:y + height]]
+            if any(rows):
+                planes[color] = rows
+        return BitImage(width, height, planes)
+
+    def trimmed_top(self) -> "BitImage":
+        # the top left corner of an "Ask Professor Science" panel
+        mask = -1 << 241
+        planes = {color: [row & mask for row in plane[:47]] + plane[47:] for color, plane in self.planes.items()}
+        return BitImage(self.width, self.height, planes)
+
+    @cached_property
+    def rows(self) -> list[int]:
+        rows = [0] * self.height
+        for plane in self.planes.values():
+            rows = [row | plane_row for row, plane_row in zip(rows, plane)]
+        return rows
+
+    @cached_property
+    def pixels(self) -> "BitImagePixels":
+        return BitImagePixels(self)
+
+    def get_pixel(self, pixel: Pixel) -> Color:
+        x, y = pixel
+        if x < 0 or not 0 <= y < self.height:
+            return WHITE
+        for color, plane in self.planes.items():
+            if plane[y] >> x & 1:
+                return color
+        return WHITE
+
+    def has_ink(self, x: int, y: int) -> bool:
+        return x >= 0 and 0 <= y < self.height and self.rows[y] >> x & 1 == 1
+
+    def get_row(self, y: int) -> int:
+        return self.rows[y] if 0 <= y < self.height else 0
+
+    def get_column(self, x: int, y0: int, height: int) -> int:
+        """Pixels (x, y0)..(x, y0 + height - 1) as a bitmask, top pixel in the most significant bit."""
+        if x < 0:
+            return 0
+        bitmask = 0
+        for y in range(y0, y0 + height):
+            bitmask = bitmask << 1 | (self.get_row(y) >> x & 1)
+        return bitmask
+
+    def count_in_box(self, box: Box) -> int:
+        left = max(box.left, 0)
+        mask = (1 << max(box.right - left, 0)) - 1
+        return sum((row >> left & mask).bit_count() for row in self.rows[max(box.top, 0):max(box.bottom, 0)])
+
+    def any_in_box(self, box: Box) -> bool:
+        left = max(box.left, 0)
+        mask = (1 << max(box.right - left, 0)) - 1
+        return any(row >> left & mask for row in self.rows[max(box.top, 0):max(box.bottom, 0)])
+
+    def is_on_edge(self, pixel: Pixel) -> bool:
+        x, y = pixel
+        return x in (0, self.width - 1) or y in (0, self.height - 1)
+
+    def distance_to_edge(self, pixel: Pixel) -> int:
+        return min(pixel.x, pixel.y, self.width - pixel.x - 1, self.height - pixel.y - 1)
+
+
+class BitImagePixels(Mapping[Pixel, Color]):
+    """Read-only dict-like view of the ink in a BitImage, iterated in raster order."""
+
+    def __init__(self, image: BitImage):
+        self._image = image
+        self._rows = image.rows
+        self._height = image.height
+
+    def __getitem__(self, pixel: Pixel) -> Color:
+        color = self._image.get_pixel(pixel)
+        if color == WHITE:
+            raise KeyError(pixel)
+        return color
+
+    def __contains__(self, pixel: object) -> bool:
+        x, y = pixel
+        return x >= 0 and 0 <= y < self._height and self._rows[y] >> x & 1 == 1
+
+    def __iter__(self) -> Iterator[Pixel]:
+        for y, row in enumerate(self._rows):
+            while row:
+                lowest_bit = row & -row
+                yield Pixel(lowest_bit.bit_length() - 1, y)
+                row ^= lowest_bit
+
+    def __len__(self) -> int:
+        return sum(row.bit_count() for row in self._rows)
+
+
+def get_first_pixel(plane: list[int]) -> Pixel | None:
+    for y, row in enumerate(plane):
+        if row:
+            return Pixel((row & -row).bit_length() - 1, y)
+    return None
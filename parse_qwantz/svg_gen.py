@@ -28,8 +28,9 @@ BATMAN_RIGHT_PATH = files(parse_qwantz).joinpath('img/batman-right.svg')
 
 def generate_svg(image: Image.Image):
     masked, good_panels = prepare_image(image)
-    ask_professor_science = _is_ask_professor_science(masked)
-    simple_image = SimpleImage.from_image(masked, ask_professor_science)
+    _, (x, y) = PANELS[0]
+    ask_professor_science = is_ask_professor_science(image, Pixel(x, y))
+    simple_image = SimpleImage.from_bit_image(masked, ask_professor_science)
     lines, char_boxes, characters = get_elements_for_svg(simple_image)
     svg_elements = [make_line_element(line, width, i) for i, (line, width) in enumerate(lines)]
     svg_elements.extend(
@@ -41,13 +42,6 @@ def generate_svg(image: Image.Image):
     return render_svg(svg_elements)
 
 
-def _is_ask_professor_science(image: Image.Image) -> bool:
-    panel = PANELS[0]
-    (width, height), (x, y) = panel
-    cropped = image.crop((x, y, x + width, y + height))
-    return is_ask_professor_science(cropped)
-
-
 def get_professor_science_sign() -> ElementTree.Element:
     doc = ElementTree.parse(ASK_PROFESSOR_SCIENCE_PATH)
     root = doc.getroot()
@@ -1,6 +1,6 @@
 import logging
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from functools import cached_property, cmp_to_key
 from itertools import groupby
 from typing import Iterable
@@ -9,36 +9,40 @@ from parse_qwantz.box import Box, get_interval_distance
 from parse_qwantz.fonts import Font, CharBox
 from parse_qwantz.colors import Color
 from parse_qwantz.hyphens import disambiguate_hyphen
-from parse_qwantz.text_lines import TextLine, group_text_lines
+from parse_qwantz.text_lines import TextLine, RowIndex, group_text_lines
 from parse_qwantz.pixels import Pixel
 
 logger = logging.getLogger()
 
 
-@dataclass
+@dataclass(frozen=True, eq=True)
 class TextBlock:
     rows: list[list[TextLine]]
     alignments: list["Alignment"]
     color: Color
     font: Font
+    # content() for each (mark_bold, mark_italic, include_font_name)
+    rendered_content: dict[tuple[bool, bool, bool], str] = field(
+        default_factory=dict, init=False, compare=False, repr=False
+    )
 
-    @property
+    @cached_property
     def start(self) -> Pixel:
         return self.rows[0][0].start
 
-    @property
+    @cached_property
     def end(self) -> Pixel:
         return self.rows[-1][-1].end
 
-    @property
+    @cached_property
     def is_bold(self) -> bool:
         return all(line.is_bold for line in self.lines)
 
-    @property
+    @cached_property
     def is_italic(self) -> bool:
         return all(line.is_italic for line in self.lines)
 
-    @property
+    @cached_property
     def box(self) -> Box:
         top = self.start.y
         bottom = self.end.y
@@ -46,24 +50,30 @@ class TextBlock:
         right = max(line[-1].end.x for line in self.rows)
         return Box(Pixel(left, top), Pixel(right, bottom))
 
-    @property
-    def lines(self) -> Iterable[TextLine]:
-        for row in self.rows:
-            yield from row
+    @cached_property
+    def lines(self) -> tuple[TextLine, ...]:
+        return tuple(line for row in self.rows for line in row)
+
+    @cached_property
+    def row_indices(self) -> dict[TextLine, int]:
+        return {line: i for i, row in enumerate(self.rows) for line in row}
 
     @cached_property
     def bond_strengths(self) -> list[int]:
         return [alignment.strength for alignment in self.alignments]
 
-    def content(self, mark_bold=True, mark_italic=True, include_font_name=False, log=False):
+    @cached_property
+    def joined_char_boxes(self) -> tuple[list[CharBox], list[str]]:
+        """Char boxes of all rows joined with spaces or hyphens removed, and the hyphenation warnings to log."""
         char_boxes = []
+        warnings = []
         for row in self.rows:
             row_char_boxes = list(self.get_row_charboxes(row))
             row_content = "".join(char_box.char for char_box in row_char_boxes)
             if char_boxes:
                 if char_boxes[-1].char == '-' and char_boxes[-2].char not in ' -':
-                    if log and row_content.endswith("-") and " " not in row_content:
-                        logger.warning("Multiple hyphenation")
+                    if row_content.endswith("-") and " " not in row_content:
+                        warnings.append("Multiple hyphenation")
                         multiple_hyphenation = True
                     else:
                         multiple_hyphenation = False
@@ -75,7 +85,11 @@ class TextBlock:
                     if last_words.startswith("'"):
                         last_words = last_words[1:]
                     next_words = re.match(r'[^].,!?"\' :;)/]*', row_content).group()
-                    if not disambiguate_hyphen(last_words.split("-"), next_words.strip("-").split("-"), log=log and not multiple_hyphenation):
+                    if not disambiguate_hyphen(
+                        last_words.split("-"),
+                        next_words.strip("-").split("-"),
+                        warnings=None if multiple_hyphenation else warnings,
+                    ):
                         char_boxes.pop()
                 elif (
                     not (row_content.startswith("+") and row_content[1] != " ")
@@ -85,6 +99,16 @@ class TextBlock:
                 ):
                     char_boxes.append(CharBox.space(is_bold=char_boxes[-1].is_bold, is_italic=char_boxes[-1].is_italic))
             char_boxes.extend(row_char_boxes)
+        return char_boxes, warnings
+
+    def content(self, mark_bold=True, mark_italic=True, include_font_name=False, log=False):
+        char_boxes, warnings = self.joined_char_boxes
+        if log:
+            for warning in warnings:
+                logger.warning(warning)
+        key = (mark_bold, mark_italic, include_font_name)
+        if key in self.rendered_content:
+            return self.rendered_content[key]
 
         grouped_char_boxes = groupby(
             char_boxes, key=lambda cb: (cb.is_bold and mark_bold, cb.is_italic and mark_italic)
@@ -100,6 +124,7 @@ class TextBlock:
         content = content.replace('  ', ' ')
         if include_font_name and self.font.display_name is not None:
             content = f"〚{self.font.display_name}〛 {content}"
+        self.rendered_content[key] = content
         return content
 
     @staticmethod
@@ -167,7 +192,7 @@ class TextBlock:
         return not (alignment.no_gap and alignment.left_aligned)
 
     def row_index(self, line: TextLine) -> int:
-        return next(i for i, row in enumerate(self.rows) if line in row)
+        return self.row_indices[line]
 
     def extra_info(self) -> list[str]:
         return [
@@ -235,20 +260,35 @@ class Alignment:
 
 def get_text_blocks(text_lines: list[TextLine]) -> Iterable[TextBlock]:
     grouped_lines = group_text_lines(text_lines)
-    while grouped_lines:
-        new_block = [grouped_lines[0]]
+    # a group can only be fitted to a block of the same font group and color, just below its last group
+    index = RowIndex(
+        grouped_lines,
+        key=lambda line_group: (line_group[0].font.group, line_group[0].color),
+        row=lambda line_group: min(line_group[0].box().top, line_group[-1].box().top),
+    )
+    used = [False] * len(grouped_lines)
+    for i, line_group in enumerate(grouped_lines):
+        if used[i]:
+            continue
+        used[i] = True
+        new_block = [line_group]
         alignments = []
-        font = grouped_lines[0][0].font
-        new_lines: list[list[TextLine]] = []
-        for text_line_group in grouped_lines[1:]:
-            alignment = fit_to_block(text_line_group, new_block[-1], font)
+        font = line_group[0].font
+        color = line_group[0].color
+        j = i
+        while True:
+            previous_bottom = max(new_block[-1][0].box().bottom, new_block[-1][-1].box().bottom)
+            rows = range(previous_bottom - 1, previous_bottom + font.height // 6 + 1)
+            j = index.next_index((font.group, color), rows, after=j)
+            if j is None:
+                break
+            if used[j]:
+                continue
+            alignment = fit_to_block(grouped_lines[j], new_block[-1], font)
             if alignment is not None:
-                new_block.append(text_line_group)
+                new_block.append(grouped_lines[j])
                 alignments.append(alignment)
-            else:
-                new_lines.append(text_line_group)
-        grouped_lines = new_lines
-        color = new_block[0][0].color
+                used[j] = True
         yield TextBlock(new_block, alignments, color, font)
 
 
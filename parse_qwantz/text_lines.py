@@ -1,8 +1,9 @@
+from bisect import bisect_right
 from functools import cached_property
 
 from dataclasses import dataclass
 from itertools import chain
-from typing import Iterable
+from typing import Iterable, Hashable, Generic, TypeVar, Callable
 
 from parse_qwantz.box import Box
 from parse_qwantz.colors import Color
@@ -76,17 +77,14 @@ class TextLine:
         return id(self)
 
 
-def try_text_line(start: Pixel, image: SimpleImage, font: Font) -> tuple[TextLine, list[str]] | None:
-    x0, y0 = start
-    if font.italic_offsets:
-        max_x_offset = font.space_width - 3
-    else:
-        max_x_offset = 0
-    max_y_offset = font.height - 1
-    for x in range(x0 - max_x_offset, x0 + 1):
-        for y in range(y0, y0 - max_y_offset - 1, -1):
-            if result := get_text_line(Pixel(x, y), image, font):
-                return result
+def try_text_line(
+    start: Pixel, image: SimpleImage, font: Font, line_starts: list[Pixel] | None = None
+) -> tuple[TextLine, list[str]] | None:
+    if line_starts is None:
+        line_starts = font.get_line_starts(start)
+    for line_start in line_starts:
+        if result := get_text_line(line_start, image, font):
+            return result
 
 
 def get_text_line(start: Pixel, image: SimpleImage, font: Font) -> tuple[TextLine, list[str]] | None:
@@ -195,21 +193,54 @@ def cleanup_text_lines(text_lines: list[TextLine]) -> list[TextLine]:
     )
 
 
+T = TypeVar('T')
+
+
+class RowIndex(Generic[T]):
+    """
+    Items (e.g. text lines) bucketed by a key and a row, for scanning them in their original order while looking
+    only at the items in a few given rows.
+    """
+
+    def __init__(self, items: list[T], key: Callable[[T], Hashable], row: Callable[[T], int]):
+        self.items = items
+        self.buckets: dict[tuple[Hashable, int], list[int]] = {}
+        for i, item in enumerate(items):
+            self.buckets.setdefault((key(item), row(item)), []).append(i)
+
+    def next_index(self, key: Hashable, rows: Iterable[int], after: int) -> int | None:
+        """The index of the first item after `after` with the given key and in one of the given rows."""
+        next_index = None
+        for row in rows:
+            if bucket := self.buckets.get((key, row)):
+                i = bisect_right(bucket, after)
+                if i < len(bucket) and (next_index is None or bucket[i] < next_index):
+                    next_index = bucket[i]
+        return next_index
+
+
 def group_text_lines(text_lines: list[TextLine]) -> list[list[TextLine]]:
     grouped_text_lines = []
     used: set[TextLine] = set()
-    for text_line in text_lines:
+    base_boxes = {text_line: text_line.base_box() for text_line in text_lines}
+    # lines can only be grouped if their base boxes' bottoms are at most 1 pixel apart
+    index = RowIndex(text_lines, key=lambda line: line.font.group, row=lambda line: base_boxes[line].bottom)
+    for i, text_line in enumerate(text_lines):
         if text_line in used:
             continue
         used.add(text_line)
         group = [text_line]
-        for other_text_line in text_lines:
+        j = i
+        while True:
+            bottom = base_boxes[group[-1]].bottom
+            j = index.next_index(text_line.font.group, range(bottom - 1, bottom + 2), after=j)
+            if j is None:
+                break
+            other_text_line = text_lines[j]
             if other_text_line in used:
                 continue
-            if other_text_line.font.group != text_line.font.group:
-                continue
-            box = group[-1].base_box()
-            other_box = other_text_line.base_box()
+            box = base_boxes[group[-1]]
+            other_box = base_boxes[other_text_line]
             vertical_offset = abs(box.bottom - other_box.bottom)
             same_font = other_text_line.font == text_line.font
             if (vertical_offset <= 1 and same_font) or vertical_offset == 0:
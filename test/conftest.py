@@ -0,0 +1,96 @@
+import os
+import random
+import shutil
+import tempfile
+from functools import cache
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+CACHE_DIR = tempfile.mkdtemp(prefix='parse_qwantz_test_cache_')
+# set before the package is imported: the fonts are loaded from the cache at import time
+os.environ['PARSE_QWANTZ_CACHE_DIR'] = CACHE_DIR
+
+from parse_qwantz.colors import BLACK, GREY, RED  # noqa: E402
+from parse_qwantz.elements import get_elements  # noqa: E402
+from parse_qwantz.panel_scene import PanelScene  # noqa: E402
+from parse_qwantz.panels import CHARACTERS, PANELS  # noqa: E402
+from parse_qwantz.pixels import Pixel  # noqa: E402
+from parse_qwantz.prepare_image import prepare_image  # noqa: E402
+from parse_qwantz.simple_image import SimpleImage  # noqa: E402
+
+INPUT_FILE_DIR = Path('test/comics')
+SAMPLE_COMICS = ['0001.png', '0002.png', '0003.png']
+
+WIDTH = 70
+HEIGHT = 12
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+
+def get_random_image(seed: int, density: float) -> SimpleImage:
+    rng = random.Random(seed)
+    pixels = {
+        Pixel(x, y): rng.choice([BLACK, RED, GREY])
+        for x in range(WIDTH)
+        for y in range(HEIGHT)
+        if rng.random() < density
+    }
+    return SimpleImage(WIDTH, HEIGHT, pixels)
+
+
+INK_IMAGES = {
+    'empty': SimpleImage(WIDTH, HEIGHT, {}),
+    'first pixel': SimpleImage(WIDTH, HEIGHT, {Pixel(0, 0): BLACK}),
+    'last column': SimpleImage(WIDTH, HEIGHT, {Pixel(WIDTH - 1, HEIGHT - 1): RED, Pixel(WIDTH - 1, 0): GREY}),
+    'full': SimpleImage(WIDTH, HEIGHT, {Pixel(x, y): BLACK for x in range(WIDTH) for y in range(HEIGHT)}),
+    # connected only through corners
+    'diagonal': SimpleImage(WIDTH, HEIGHT, {Pixel(WIDTH - 1 - i, i): BLACK for i in range(HEIGHT)}),
+    # a ring around a hole, touching the last column
+    'ring': SimpleImage(WIDTH, HEIGHT, {
+        Pixel(x, y): BLACK
+        for x in range(WIDTH - 5, WIDTH)
+        for y in range(3, 8)
+        if x in (WIDTH - 5, WIDTH - 1) or y in (3, 7)
+    }),
+    'sparse': get_random_image(1, 0.1),
+    'medium': get_random_image(2, 0.4),
+    'dense': get_random_image(3, 0.6),
+}
+
+
+@pytest.fixture(params=list(INK_IMAGES.values()), ids=list(INK_IMAGES))
+def ink_image(request) -> SimpleImage:
+    return request.param
+
+
+@cache
+def get_panel_elements(name: str) -> list[tuple[int, SimpleImage, tuple]]:
+    masked, good_panels = prepare_image(Image.open(INPUT_FILE_DIR / name))
+    panels = []
+    for i, ((width, height), (x, y)) in enumerate(PANELS, start=1):
+        if i in good_panels:
+            image = SimpleImage.from_bit_image(masked.crop(x, y, width, height))
+            panels.append((i, image, get_elements(image)))
+    return panels
+
+
+@pytest.fixture(params=SAMPLE_COMICS)
+def comic_name(request) -> str:
+    return request.param
+
+
+@pytest.fixture
+def panel_images(comic_name: str) -> list[SimpleImage]:
+    return [image for _i, image, _elements in get_panel_elements(comic_name)]
+
+
+@pytest.fixture
+def panel_scenes(comic_name: str) -> list[PanelScene]:
+    scenes = []
+    for i, image, (lines, _widths, thoughts, text_lines, extra_characters, _unmatched) in get_panel_elements(comic_name):
+        scenes.append(PanelScene.from_elements(image, lines, thoughts, CHARACTERS[i - 1] + extra_characters, text_lines))
+    return scenes
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from parse_qwantz.fonts import (
+    ALL_FONTS, DEFAULT_GLYPH_CACHE_SIZE, FONTS_CACHE_FILE, build_fonts, get_fonts_key, get_glyph_cache_size, load_fonts
+)
+from parse_qwantz.persistent_cache import get_cache_dir
+
+
+def test_cached_fonts_are_the_built_fonts(tmp_path, monkeypatch):
+    monkeypatch.setenv('PARSE_QWANTZ_CACHE_DIR', str(tmp_path))
+    built_fonts = load_fonts()
+    assert (get_cache_dir() / FONTS_CACHE_FILE).exists()
+    assert load_fonts() == built_fonts == ALL_FONTS
+
+
+def test_corrupt_fonts_cache_is_rebuilt(tmp_path, monkeypatch):
+    monkeypatch.setenv('PARSE_QWANTZ_CACHE_DIR', str(tmp_path))
+    cache_path = get_cache_dir() / FONTS_CACHE_FILE
+    cache_path.parent.mkdir(parents=True)
+    cache_path.write_text('{"key": "')
+    assert load_fonts() == ALL_FONTS
+    cache_path.write_text(json.dumps({'key': get_fonts_key(), 'fonts': [{'type': 'MonospaceFont'}]}))
+    assert load_fonts() == ALL_FONTS
+    assert json.loads(cache_path.read_text())['fonts'][0]['fields']['name'] == ALL_FONTS[0].name
+
+
+def test_fonts_cache_disabled(monkeypatch):
+    monkeypatch.setenv('PARSE_QWANTZ_CACHE_DIR', '')
+    assert load_fonts() == build_fonts()
+
+
+@pytest.mark.parametrize(['value', 'size'], [
+    (None, DEFAULT_GLYPH_CACHE_SIZE),
+    ('100', 100),
+    ('0', 0),
+    ('', DEFAULT_GLYPH_CACHE_SIZE),
+    ('many', DEFAULT_GLYPH_CACHE_SIZE),
+    ('-1', DEFAULT_GLYPH_CACHE_SIZE),
+])
+def test_glyph_cache_size(monkeypatch, value: str | None, size: int):
+    if value is None:
+        monkeypatch.delenv('PARSE_QWANTZ_GLYPH_CACHE_SIZE', raising=False)
+    else:
+        monkeypatch.setenv('PARSE_QWANTZ_GLYPH_CACHE_SIZE', value)
+    assert get_glyph_cache_size() == size
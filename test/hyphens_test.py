@@ -0,0 +1,102 @@
+import struct
+from itertools import chain
+
+import pytest
+
+from parse_qwantz.hyphens import (
+    DICT_PATHS, REMOVED_DICT_PATH, WORDS_CACHE_FILE, WordList, get_dicts_key, get_qwantz_words, read_dict
+)
+from parse_qwantz.persistent_cache import get_cache_dir
+
+KEY = bytes(range(16))
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('PARSE_QWANTZ_CACHE_DIR', str(tmp_path))
+    get_qwantz_words.cache_clear()
+    yield get_cache_dir()
+    get_qwantz_words.cache_clear()
+
+
+def get_plain_words() -> set[str]:
+    words = set(chain.from_iterable(read_dict(dict_path) for dict_path in DICT_PATHS))
+    return words - read_dict(REMOVED_DICT_PATH)
+
+
+@pytest.mark.parametrize('words', [
+    [],
+    ['a'],
+    ['b', 'a', 'c', 'ab'],
+    ['café', 'cafe', 'ça', 'ab-ba'],
+])
+def test_word_list(words: list[str]):
+    word_list = WordList.build(words, KEY)
+    assert len(word_list) == len(words)
+    assert word_list.key == KEY
+    for word in words:
+        assert word in word_list
+    for word in ['', 'aa', 'b-', 'caf', 'zzz']:
+        assert (word in word_list) == (word in words)
+
+
+def test_word_list_layout():
+    data = WordList.build(['b', 'a'], KEY).data
+    assert data[:4] == b'QWWL'
+    assert struct.unpack_from('<III', data, 32) == (0, 1, 2)
+    assert data[-2:] == b'ab'
+
+
+@pytest.mark.parametrize('data', [
+    b'',
+    b'QWWL',
+    b'XXXX' + bytes(28),
+    WordList.build(['a'], KEY).data[:-1],
+    WordList.build(['a'], KEY).data + b'b',
+    struct.pack('<4sI16sQ', b'QWWL', 2, KEY, 0) + bytes(4),
+    struct.pack('<4sI16sQ', b'QWWL', 1, KEY, 10**6),
+])
+def test_invalid_word_list(data: bytes):
+    with pytest.raises(ValueError):
+        WordList(data)
+
+
+def test_cached_word_list_is_the_plain_text_word_list(cache_dir):
+    plain_words = get_plain_words()
+    word_list = get_qwantz_words()
+    assert (cache_dir / WORDS_CACHE_FILE).exists()
+    get_qwantz_words.cache_clear()
+    cached_word_list = get_qwantz_words()
+    assert cached_word_list.data[:] == word_list.data
+    assert len(cached_word_list) == len(plain_words)
+    assert all(word in cached_word_list for word in plain_words)
+    assert {cached_word_list.get_word(i).decode() for i in range(len(cached_word_list))} == plain_words
+
+
+@pytest.mark.parametrize('content', [
+    b'',
+    b'garbage',
+    WordList.build(['a'], bytes(16)).data,
+    WordList.build(['a'], KEY).data[:-1],
+])
+def test_corrupt_or_stale_word_list_cache_is_rebuilt(cache_dir, content: bytes):
+    cache_path = cache_dir / WORDS_CACHE_FILE
+    cache_path.parent.mkdir(parents=True)
+    cache_path.write_bytes(content)
+    assert get_qwantz_words().key == get_dicts_key()
+    assert len(get_qwantz_words()) == len(get_plain_words())
+    assert WordList(cache_path.read_bytes()).key == get_dicts_key()
+
+
+def test_missing_word_list_cache(cache_dir):
+    assert not (cache_dir / WORDS_CACHE_FILE).exists()
+    assert len(get_qwantz_words()) == len(get_plain_words())
+
+
+def test_word_list_cache_disabled(monkeypatch):
+    monkeypatch.setenv('PARSE_QWANTZ_CACHE_DIR', '')
+    get_qwantz_words.cache_clear()
+    try:
+        assert len(get_qwantz_words()) == len(get_plain_words())
+    finally:
+        get_qwantz_words.cache_clear()
@@ -0,0 +1,34 @@
+import random
+
+from parse_qwantz.fonts import ALL_FONTS, LINE_START_INDEX
+from parse_qwantz.pixels import Pixel
+from parse_qwantz.simple_image import SimpleImage
+
+SEEDS_PER_PANEL = 40
+
+
+def get_seeds(image: SimpleImage) -> list[Pixel]:
+    pixels = sorted(image.pixels)
+    last_column = [pixel for pixel in pixels if pixel.x == image.width - 1]
+    return random.Random(0).sample(pixels, min(SEEDS_PER_PANEL, len(pixels))) + last_column
+
+
+def test_line_starts_include_all_char_starts(panel_images: list[SimpleImage]):
+    for image in panel_images:
+        for seed in get_seeds(image):
+            all_line_starts = LINE_START_INDEX.get_line_starts(seed, image)
+            for font, line_starts in zip(ALL_FONTS, all_line_starts):
+                if line_starts is None:
+                    continue
+                all_starts = font.get_line_starts(seed)
+                assert line_starts == [start for start in all_starts if start in line_starts]
+                for start in all_starts:
+                    char_box, _complement = font.get_char(start, image, is_first=True)
+                    if char_box is not None and char_box.char != ' ':
+                        assert start in line_starts, (seed, font.name)
+
+
+def test_no_line_starts_without_ink():
+    image = SimpleImage(50, 30, {})
+    for pixel in [Pixel(0, 0), Pixel(49, 29), Pixel(25, 15)]:
+        assert all(not line_starts for line_starts in LINE_START_INDEX.get_line_starts(pixel, image))
@@ -0,0 +1,123 @@
+import math
+
+from parse_qwantz.box import Box
+from parse_qwantz.lines import Line
+from parse_qwantz.match_lines import (
+    CHARACTER_DISTANCE_THRESHOLD, TEXT_LINE_DISTANCE_THRESHOLD, TEXT_LINE_INNER_PADDING, CandidateResolver, Character,
+    TargetIndex, get_box_scores, intersects, match_line, sides,
+)
+from parse_qwantz.panel_scene import PanelScene
+from parse_qwantz.pixels import Pixel
+
+GRID_STEP = 7
+
+
+def is_close(box: Box, pixel: Pixel, threshold: int) -> bool:
+    distance = box.distance(pixel)
+    return distance is not None and distance <= threshold
+
+
+def test_empty_target_index():
+    target_index = TargetIndex([], [])
+    for pixel in [Pixel(0, 0), Pixel(-50, 300), Pixel(1000, 1000)]:
+        assert target_index.get_targets(pixel) == ([], [])
+    character = Character('T-Rex', ())
+    assert TargetIndex([], [character]).get_targets(Pixel(0, 0)) == ([], [])
+
+
+def test_target_index_includes_close_targets(panel_scenes: list[PanelScene]):
+    for scene in panel_scenes:
+        text_lines = list(scene.block_by_line)
+        target_index = TargetIndex(text_lines, scene.characters)
+        pixels = [
+            Pixel(x, y)
+            for x in range(-GRID_STEP, scene.image.width + GRID_STEP, GRID_STEP)
+            for y in range(-GRID_STEP, scene.image.height + GRID_STEP, GRID_STEP)
+        ]
+        pixels.extend(end for line in scene.lines for end in line)
+        for pixel in pixels:
+            indexed_text_lines, indexed_characters = target_index.get_targets(pixel)
+            close_text_lines = [
+                text_line for text_line in text_lines
+                if is_close(text_line.base_box(TEXT_LINE_INNER_PADDING), pixel, TEXT_LINE_DISTANCE_THRESHOLD)
+            ]
+            close_characters = [
+                character for character in scene.characters
+                if any(is_close(box, pixel, CHARACTER_DISTANCE_THRESHOLD) for box in character.boxes)
+            ]
+            assert [text_line for text_line in indexed_text_lines if text_line in close_text_lines] == close_text_lines
+            assert [character for character in indexed_characters if character in close_characters] == close_characters
+            assert indexed_text_lines == [text_line for text_line in text_lines if text_line in indexed_text_lines]
+
+
+class FullPassResolver(CandidateResolver):
+    """Resolves every candidate pair in every pass, like before the worklist."""
+    def resolve_candidates(self, candidates_pairs, worklist, dependent_pairs):
+        all_pairs = set(range(len(candidates_pairs)))
+        changed, _worklist = super().resolve_candidates(candidates_pairs, all_pairs, dependent_pairs)
+        return changed, all_pairs
+
+
+def test_resolve_no_lines():
+    assert CandidateResolver([], {}).resolve() == ([], [])
+
+
+def test_worklist_resolver_is_full_pass_resolver(panel_scenes: list[PanelScene]):
+    for scene in panel_scenes:
+        target_index = TargetIndex(list(scene.block_by_line), scene.characters)
+
+        def get_line_candidates():
+            return [(line,) + match_line(line, target_index, scene.image) for line in scene.lines]
+
+        expected = FullPassResolver(get_line_candidates(), scene.block_by_line).resolve()
+        assert CandidateResolver(get_line_candidates(), scene.block_by_line).resolve() == expected
+
+
+# the scalar scoring functions get_box_scores replaced, as a reference
+def get_box_distance(box: Box, line: Line, end_no: int) -> float | None:
+    distance = box.distance(line[end_no])
+    if distance is None:
+        return None
+    other_end = line[1 - end_no]
+    other_distance = box.distance(other_end)
+    if other_distance is not None and distance > other_distance:
+        return None
+    return distance
+
+
+def get_miss_angle_cos(box: Box, line: Line, end_no: int) -> float:
+    corners = [box.top_left, box.bottom_left, box.top_right, box.bottom_right]
+    angle_cosines = [get_angle_cos(line, end_no, corner) for corner in corners]
+    max_angle_cos = max(angle_cosines)
+    if max_angle_cos < 0:
+        return max_angle_cos
+    if any(intersects(line, end_no, side) for side in sides(box)):
+        return 1
+    return max_angle_cos
+
+
+def get_angle_cos(line: Line, end_no: int, pixel: Pixel) -> float:
+    this_end = line[end_no]
+    other_end = line[1-end_no]
+    vec1 = (this_end[0] - other_end[0], this_end[1] - other_end[1])
+    vec2 = (pixel[0] - this_end[0], pixel[1] - this_end[1])
+    dot_product = vec1[0] * vec2[0] + vec1[1] * vec2[1]
+    abs1 = math.sqrt(vec1[0]*vec1[0] + vec1[1]*vec1[1])
+    abs2 = math.sqrt(vec2[0]*vec2[0] + vec2[1]*vec2[1])
+    denominator = abs1 * abs2
+    return 1 if denominator < 0.00001 else dot_product/denominator
+
+
+def test_box_scores_empty():
+    assert get_box_scores((Pixel(0, 0), Pixel(10, 10)), 0, []) == ([], [])
+
+
+def test_box_scores_are_scalar_scores(panel_scenes: list[PanelScene]):
+    for scene in panel_scenes:
+        boxes = [text_line.base_box(TEXT_LINE_INNER_PADDING) for text_line in scene.block_by_line]
+        boxes.extend(box for character in scene.characters for box in character.boxes)
+        for line in scene.lines:
+            for end_no in (0, 1):
+                distances, miss_angle_cosines = get_box_scores(line, end_no, boxes)
+                assert distances == [get_box_distance(box, line, end_no) for box in boxes]
+                assert miss_angle_cosines == [get_miss_angle_cos(box, line, end_no) for box in boxes]
@@ -0,0 +1,60 @@
+import hashlib
+import os
+import shutil
+from pathlib import Path
+
+from PIL import Image
+
+from parse_qwantz.panel_overrides import DIGESTS_DIR, get_file_key, get_image_md5
+from parse_qwantz.persistent_cache import get_cache_dir
+
+COMIC_PATH = Path('test/comics/0001.png')
+OTHER_COMIC_PATH = Path('test/comics/0002.png')
+
+
+def test_image_md5_is_cached_per_file(tmp_path, monkeypatch):
+    monkeypatch.setenv('PARSE_QWANTZ_CACHE_DIR', str(tmp_path))
+    image = Image.open(COMIC_PATH)
+    md5 = hashlib.md5(image.tobytes()).hexdigest()
+    assert get_image_md5(image) == md5
+    entry_path = get_cache_dir() / DIGESTS_DIR / get_file_key(image)
+    assert entry_path.read_text() == md5
+    entry_path.write_text('0' * 32)
+    assert get_image_md5(Image.open(COMIC_PATH)) == '0' * 32
+
+
+def test_image_md5_follows_file_contents(tmp_path, monkeypatch):
+    monkeypatch.setenv('PARSE_QWANTZ_CACHE_DIR', str(tmp_path / 'cache'))
+    comic_path = tmp_path / 'comic.png'
+    shutil.copy(COMIC_PATH, comic_path)
+    stat = comic_path.stat()
+    assert get_image_md5(Image.open(comic_path)) == hashlib.md5(Image.open(COMIC_PATH).tobytes()).hexdigest()
+    # replaced in place, with the old modification time (like cp -p or rsync -t would)
+    shutil.copy(OTHER_COMIC_PATH, comic_path)
+    os.utime(comic_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    other_md5 = hashlib.md5(Image.open(OTHER_COMIC_PATH).tobytes()).hexdigest()
+    assert get_image_md5(Image.open(comic_path)) == other_md5
+    # moved: still found in the cache
+    moved_path = tmp_path / 'moved.png'
+    comic_path.rename(moved_path)
+    entry_path = get_cache_dir() / DIGESTS_DIR / get_file_key(Image.open(moved_path))
+    assert entry_path.read_text() == other_md5
+
+
+def test_corrupt_digest_entry_is_recomputed(tmp_path, monkeypatch):
+    monkeypatch.setenv('PARSE_QWANTZ_CACHE_DIR', str(tmp_path))
+    image = Image.open(COMIC_PATH)
+    entry_path = get_cache_dir() / DIGESTS_DIR / get_file_key(image)
+    entry_path.parent.mkdir(parents=True)
+    entry_path.write_bytes(b'\xff garbage')
+    md5 = hashlib.md5(image.tobytes()).hexdigest()
+    assert get_image_md5(image) == md5
+    assert entry_path.read_text() == md5
+
+
+def test_image_without_file_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv('PARSE_QWANTZ_CACHE_DIR', str(tmp_path))
+    image = Image.open(COMIC_PATH).copy()
+    assert get_file_key(image) is None
+    assert get_image_md5(image) == hashlib.md5(image.tobytes()).hexdigest()
+    assert not (get_cache_dir() / DIGESTS_DIR).exists()
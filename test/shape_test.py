@@ -0,0 +1,69 @@
+import pytest
+
+from parse_qwantz.pixels import Pixel
+from parse_qwantz.shape import ComponentLabels, get_shape
+from parse_qwantz.simple_image import SimpleImage
+
+
+def test_components_are_shapes(ink_image: SimpleImage):
+    labels = ComponentLabels(ink_image)
+    with pytest.raises(KeyError):
+        labels.get_label(Pixel(ink_image.width, ink_image.height))
+    assert sum(component.size for component in labels.components.values()) == len(ink_image.pixels)
+    checked = set()
+    for pixel in ink_image.pixels:
+        component = labels.get_component(pixel)
+        if pixel not in checked:
+            assert component.pixels == get_shape(pixel, ink_image)
+            assert component.size == len(component.pixels)
+            checked.update(component.pixels)
+        assert pixel in component.pixels
+
+
+def test_removed_pixels_split_components(ink_image: SimpleImage):
+    labels = ComponentLabels(ink_image)
+    removed = set(list(ink_image.pixels)[::3])
+    labels.remove_pixels(removed)
+    remaining_image = SimpleImage(
+        ink_image.width, ink_image.height, {p: c for p, c in ink_image.pixels.items() if p not in removed}
+    )
+    checked = set()
+    for pixel in remaining_image.pixels:
+        assert not labels.is_removed(pixel)
+        component = labels.get_component(pixel)
+        if pixel not in checked:
+            assert component.pixels == get_shape(pixel, remaining_image)
+            checked.update(component.pixels)
+        assert pixel in component.pixels
+    assert all(labels.is_removed(pixel) for pixel in removed)
+
+
+def test_remove_component(ink_image: SimpleImage):
+    labels = ComponentLabels(ink_image)
+    if not ink_image.pixels:
+        assert not labels.components
+        return
+    component = labels.get_component(next(iter(ink_image.pixels)))
+    labels.remove_component(component)
+    for removed_pixel in component.pixels:
+        with pytest.raises(KeyError):
+            labels.get_label(removed_pixel)
+    for other in ink_image.pixels:
+        if other not in component.pixels:
+            assert labels.get_component(other).pixels == get_shape(other, ink_image)
+
+
+def test_remove_columns_is_remove_pixels(ink_image: SimpleImage):
+    width, height = ink_image.width, ink_image.height
+    by_pixels = ComponentLabels(ink_image)
+    by_columns = ComponentLabels(ink_image)
+    for y0, window_height in [(-2, 5), (4, 3), (height - 4, 6)]:
+        columns = [(x, ink_image.get_column(x, y0, window_height)) for x in range(width - 6, width)]
+        by_columns.remove_columns(y0, window_height, columns)
+        by_pixels.remove_pixels(
+            pixel for pixel in ink_image.pixels if pixel.x >= width - 6 and y0 <= pixel.y < y0 + window_height
+        )
+    assert by_columns.removed == by_pixels.removed
+    for pixel in ink_image.pixels:
+        if not by_columns.is_removed(pixel):
+            assert by_columns.get_component(pixel).pixels == by_pixels.get_component(pixel).pixels
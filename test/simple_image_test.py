@@ -0,0 +1,65 @@
+from PIL import Image
+
+from parse_qwantz.box import Box
+from parse_qwantz.colors import WHITE
+from parse_qwantz.pixels import Pixel
+from parse_qwantz.simple_image import BitImage, RemainingInk, SimpleImage
+
+
+def to_image(image: SimpleImage) -> Image.Image:
+    pil_image = Image.new('RGB', (image.width, image.height), WHITE)
+    for pixel, color in image.pixels.items():
+        pil_image.putpixel(pixel, color)
+    return pil_image
+
+
+def test_bit_image_is_simple_image(ink_image: SimpleImage):
+    width, height, pixels = ink_image.width, ink_image.height, ink_image.pixels
+    for bit_image in (BitImage.from_simple_image(ink_image), BitImage.from_image(to_image(ink_image))):
+        assert dict(bit_image.pixels) == pixels
+        assert len(bit_image.pixels) == len(pixels)
+        assert SimpleImage.from_bit_image(bit_image) == SimpleImage.from_image(to_image(ink_image))
+        for x in range(-1, width + 1):
+            for y in range(-1, height + 1):
+                assert bit_image.get_pixel(Pixel(x, y)) == pixels.get(Pixel(x, y), WHITE)
+                assert bit_image.has_ink(x, y) == (Pixel(x, y) in pixels)
+        for x in range(-1, width + 1):
+            for y0 in range(-2, height):
+                assert bit_image.get_column(x, y0, 4) == ink_image.get_column(x, y0, 4)
+    assert ink_image.get_columns(-3, width + 3, 2, 5) == [ink_image.get_column(x, 2, 5) for x in range(-3, width + 3)]
+
+
+def test_bit_image_crop(ink_image: SimpleImage):
+    width, pixels = ink_image.width, ink_image.pixels
+    bit_image = BitImage.from_simple_image(ink_image)
+    cropped = bit_image.crop(3, 2, width - 3, 5)
+    assert dict(cropped.pixels) == {
+        Pixel(x - 3, y - 2): color for (x, y), color in pixels.items() if x >= 3 and 2 <= y < 7
+    }
+    box = Box(Pixel(-2, 3), Pixel(width + 2, 6))
+    in_box = [pixel for pixel in pixels if 3 <= pixel.y < 6]
+    assert bit_image.count_in_box(box) == len(in_box)
+    assert bit_image.any_in_box(box) == bool(in_box)
+
+
+def test_remaining_ink(ink_image: SimpleImage):
+    width, pixels = ink_image.width, ink_image.pixels
+    remaining = RemainingInk.from_simple_image(ink_image)
+    assert dict(remaining.pixels) == pixels
+    consumed = set(list(pixels)[::2])
+    remaining.consume(consumed)
+    # the last columns, as get_column reads them
+    y0, height = 2, 5
+    last_columns = [(x, ink_image.get_column(x, y0, height)) for x in range(width - 3, width)]
+    remaining.consume_columns(y0, height, last_columns)
+    consumed |= {pixel for pixel in pixels if pixel.x >= width - 3 and y0 <= pixel.y < y0 + height}
+    left = {pixel: color for pixel, color in pixels.items() if pixel not in consumed}
+    assert dict(remaining.pixels) == left
+    assert len(remaining.pixels) == len(left)
+    assert remaining.columns == SimpleImage(width, ink_image.height, left).columns
+    seeds = []
+    while seed := remaining.next_seed():
+        seeds.append(seed)
+        remaining.consume([seed])
+    assert seeds == sorted(left)
+    assert not remaining.pixels